@@ -0,0 +1,316 @@
+import threading
+
+import pandas as pd
+import numpy as np
+
+import app_general_functions as agf
+from app_indicators import IndicatorStore
+
+# College types, and the sets of them that the user can select, as sorted tuples
+COLLEGE_TYPES = ["local", "international"]
+COLLEGE_TYPE_SETS = [
+    ("local",),
+    ("international",),
+    ("international", "local"),
+]
+
+def group_counts(group_codes, option_matrix, num_groups, var_names = None):
+    """Count the True values of each option within each group of rows.
+
+    option_matrix is either a boolean array of rows by options or an IndicatorStore, in which case var_names selects its columns. group_codes gives the group of each row, from 0 to num_groups - 1. Rows with a code of num_groups are skipped. Returns an int32 array of options by groups.
+
+    Each column is counted with one np.bincount(), which is much faster than np.add.at() or sorting the rows for np.add.reduceat(). Columns are usually contiguous in the arrays that DataFrame.to_numpy() returns for bool columns. If they are not, the matrix is copied once so that they are."""
+
+    if isinstance(option_matrix, IndicatorStore):
+        return option_matrix.group_sums(group_codes, num_groups, var_names)
+
+    if not option_matrix.flags["F_CONTIGUOUS"]:
+        option_matrix = np.asfortranarray(option_matrix)
+
+    num_options = option_matrix.shape[1]
+    counts = np.empty((num_options, num_groups), dtype = np.int32)
+
+    for j in range(num_options):
+        counts[j] = np.bincount(group_codes, weights = option_matrix[:, j], minlength = num_groups + 1)[:num_groups]
+
+    return counts
+
+def mean_option_shares(option_counts, num_apps):
+    """Mean over groups of the share of each group's rows for which each option was chosen. Groups without rows are left out.
+
+    option_counts is an array of options by groups, as returned by group_counts(). Each mean is a sum along a contiguous row divided by the number of groups, which is the same arithmetic as DataFrame.mean(), so the results are identical to the pandas version."""
+
+    has_apps = num_apps > 0
+
+    # Selecting columns with a mask does not always return a C-ordered array, and the order of the summation depends on the layout.
+    shares = np.ascontiguousarray(option_counts[:, has_apps] / num_apps[has_apps])
+
+    return shares.sum(axis = 1) / shares.shape[1]
+
+def option_shares(option_matrix, respondent_codes, num_respondents):
+    """Average share of each respondent's applications for which they chose each option, from the options of each application and the integer code of its respondent.
+
+    option_matrix is a boolean array of applications by options or an IndicatorStore. This is the computation of the Overview Charts page; OverviewStore does it in the same two steps, but keeps the counts between them so that new rows can be added."""
+
+    option_counts = group_counts(respondent_codes, option_matrix, num_respondents)
+    num_apps = np.bincount(respondent_codes, minlength = num_respondents + 1)[:num_respondents]
+
+    return mean_option_shares(option_counts, num_apps)
+
+class OverviewStore:
+    """Aggregates behind the charts of the Overview Charts page.
+
+    For each college type, the store keeps the number of applications of each respondent, and an array of options by respondents with the number of those applications for which they chose each option. These counts only grow when survey rows are added, so update() adds the new rows to them and then recomputes the chart data of every (info_type, college types) pair from the counts.
+
+    The chart data is recomputed in the same order and with the same arithmetic as the original pandas code, so the percentages are identical."""
+
+    def __init__(self, ddict, info_types = ("location", "interests", "characteristics")):
+        self.info_types = list(info_types)
+        self.ddict = ddict.loc[
+            ddict["info_type"].isin(self.info_types),
+            ["var_name", "long_name", "info_type", "is_other", "college_type"],
+        ].reset_index(drop = True)
+
+        self.var_names = self.ddict["var_name"].tolist()
+
+        # Respondent codes are kept sorted, like the index of pivot_table(index = "respondent_code").
+        self.respondents = np.array([], dtype = object)
+        self.num_apps = {
+            college_type: np.zeros(0, dtype = np.int64)
+            for college_type in COLLEGE_TYPES
+        }
+        self.option_counts = {
+            college_type: np.zeros((len(self.var_names), 0), dtype = np.int32)
+            for college_type in COLLEGE_TYPES
+        }
+
+        self.num_respondents = 0
+        self.checkbox_charts = {}
+        self.num_colleges_charts = {}
+
+        # Sessions read the chart data while a refresh may be updating it.
+        self.lock = threading.Lock()
+
+    def update(self, new_rows, new_indicators):
+        """Add survey rows to the counts and recompute the chart data. new_rows must already have the columns of db.main, including college_type, and new_indicators is the IndicatorStore of their option and location columns."""
+
+        with self.lock:
+            self.add_respondents(new_rows["respondent_code"])
+
+            positions = pd.Index(self.respondents).get_indexer(new_rows["respondent_code"])
+            num_groups = len(self.respondents)
+
+            # Rows without a respondent code are not in the store, like the missing keys that pivot_table() drops, and get the code num_groups.
+            positions = np.where(positions < 0, num_groups, positions)
+
+            for college_type in COLLEGE_TYPES:
+                # Rows of other college types get the code num_groups, which group_counts() skips.
+                type_mask = (new_rows["college_type"] == college_type).to_numpy()
+                type_codes = np.where(type_mask, positions, num_groups)
+
+                self.num_apps[college_type] += np.bincount(type_codes, minlength = num_groups + 1)[:num_groups]
+                self.option_counts[college_type] += group_counts(type_codes, new_indicators, num_groups, self.var_names)
+
+            self.make_charts()
+
+        return self
+
+    def make_charts(self):
+        """Recompute the chart data of every (info_type, college types) pair from the counts."""
+
+        self.num_respondents = len(self.respondents)
+
+        for college_types in COLLEGE_TYPE_SETS:
+            self.num_colleges_charts[college_types] = self.make_num_colleges_chart(college_types)
+
+            for info_type in self.info_types:
+                self.checkbox_charts[(info_type, college_types)] = self.make_checkbox_chart(info_type, college_types)
+
+        return None
+
+    def to_arrays(self):
+        """Counts of the store as NumPy arrays, to be saved in a snapshot. Respondent codes are encoded as UTF-8 bytes, since object arrays cannot be saved as raw bytes."""
+
+        with self.lock:
+            arrays = {"overview/respondents": np.char.encode(self.respondents.astype(str), "utf-8")}
+
+            for college_type in COLLEGE_TYPES:
+                arrays[f"overview/num_apps/{college_type}"] = self.num_apps[college_type]
+                arrays[f"overview/option_counts/{college_type}"] = self.option_counts[college_type]
+
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, ddict, arrays, info_types = ("location", "interests", "characteristics")):
+        """Store made from the arrays of to_arrays(). Memory-mapped arrays are used without a copy; the store can then be read, but copy() has to be used before update()."""
+
+        store = cls(ddict, info_types)
+
+        store.respondents = np.char.decode(arrays["overview/respondents"], "utf-8").astype(object)
+        for college_type in COLLEGE_TYPES:
+            store.num_apps[college_type] = arrays[f"overview/num_apps/{college_type}"]
+            store.option_counts[college_type] = arrays[f"overview/option_counts/{college_type}"]
+
+        store.make_charts()
+
+        return store
+
+    def copy(self):
+        """Copy of the store that can be updated without changing this one, which other sessions may still be reading."""
+
+        with self.lock:
+            store = OverviewStore.__new__(OverviewStore)
+            store.info_types = self.info_types
+            store.ddict = self.ddict
+            store.var_names = self.var_names
+            store.respondents = self.respondents.copy()
+            store.num_apps = {college_type: counts.copy() for college_type, counts in self.num_apps.items()}
+            store.option_counts = {college_type: counts.copy() for college_type, counts in self.option_counts.items()}
+            store.num_respondents = self.num_respondents
+            store.checkbox_charts = dict(self.checkbox_charts)
+            store.num_colleges_charts = dict(self.num_colleges_charts)
+            store.lock = threading.Lock()
+
+        return store
+
+    def add_respondents(self, respondent_codes):
+        """Insert rows of zeros for respondents that are not in the store yet, keeping respondents sorted."""
+
+        # np.setdiff1d() is very slow on arrays of strings, so the hash-based isin() is used instead.
+        # Missing codes are dropped, since they cannot be sorted with the strings.
+        unique_codes = pd.Series(pd.unique(respondent_codes), dtype = object).dropna()
+        new_codes = np.sort(unique_codes.loc[~unique_codes.isin(self.respondents)].to_numpy())
+
+        if len(new_codes) == 0:
+            return None
+
+        insert_positions = np.searchsorted(self.respondents, new_codes)
+
+        self.respondents = np.insert(self.respondents, insert_positions, new_codes)
+
+        for college_type in COLLEGE_TYPES:
+            self.num_apps[college_type] = np.insert(self.num_apps[college_type], insert_positions, 0)
+            self.option_counts[college_type] = np.insert(self.option_counts[college_type], insert_positions, 0, axis = 1)
+
+        return None
+
+    def set_counts(self, college_types, columns = None):
+        """Number of applications and option counts of each respondent, summed over a set of college types. Option counts are options by respondents."""
+
+        num_apps = sum(self.num_apps[college_type] for college_type in college_types)
+
+        if columns is None:
+            option_counts = sum(self.option_counts[college_type] for college_type in college_types)
+        else:
+            option_counts = sum(self.option_counts[college_type][columns] for college_type in college_types)
+
+        return num_apps, option_counts
+
+    def make_num_colleges_chart(self, college_types):
+        """Median number of applications per respondent, and the number and percentage of respondents with each number of applications."""
+
+        num_apps, option_counts = self.set_counts(college_types, columns = [])
+        num_apps = num_apps[num_apps > 0]
+
+        median_colls = int(np.median(num_apps))
+
+        values, counts = np.unique(num_apps, return_counts = True)
+
+        aggregated = pd.DataFrame({
+            "num_apps": values,
+            "num_students": counts,
+        })
+
+        aggregated["perc"] = (
+            aggregated["num_students"]
+            / len(num_apps)
+            * 100
+        ).round(2)
+
+        aggregated["perc_str"] = agf.make_perc_col(aggregated["perc"])
+
+        aggregated["is_median"] = agf.map_labels(aggregated["num_apps"].eq(median_colls), "Yes", "No")
+
+        return median_colls, aggregated
+
+    def make_checkbox_chart(self, info_type, college_types):
+        """Average share of each respondent's applications for which they chose each option."""
+
+        reference_df = self.ddict.loc[
+            self.ddict["info_type"] == info_type,
+            ["var_name", "long_name", "is_other", "college_type"],
+        ]
+
+        if info_type == "location":
+            reference_df = reference_df.loc[
+                reference_df["college_type"].isin(college_types)
+            ]
+
+        bool_cols = reference_df["var_name"].tolist()
+        columns = [self.var_names.index(var_name) for var_name in bool_cols]
+
+        num_apps, option_counts = self.set_counts(college_types, columns = columns)
+
+        perc = pd.Series(
+            mean_option_shares(option_counts, num_apps),
+            index = bool_cols,
+        )
+
+        scored_df = (
+            perc
+            .mul(100)
+            .round(2)
+            .rename("perc")
+            .reset_index(drop = False)
+            .rename(columns = {"index": "var_name"})
+            .merge(
+                right = reference_df,
+                on = "var_name",
+                how = "left",
+            )
+        )
+
+        # option_type column depends on the info_type.
+        # for locations, they are grouped into local and international
+        # for interests and characteristics, they are grouped into other options and given options
+        if info_type == "location":
+            scored_df["option_type"] = agf.title_col(scored_df["college_type"])
+        else:
+            scored_df["option_type"] = agf.map_labels(scored_df["is_other"], "Other Option", "Given Option")
+
+        scored_df["perc_str"] = agf.make_perc_col(scored_df["perc"])
+
+        return scored_df
+
+    def checkbox_chart(self, info_type, college_types):
+        """Chart data of an info_type for a set of college types."""
+
+        with self.lock:
+            return self.checkbox_charts[(info_type, tuple(sorted(college_types)))]
+
+    def num_colleges_chart(self, college_types):
+        """Median and chart data of the number of colleges applied to, for a set of college types."""
+
+        with self.lock:
+            return self.num_colleges_charts[tuple(sorted(college_types))]
+
+    def share_matrix(self, info_type, college_types):
+        """Per-respondent shares of an info_type's options, for a set of college types. Used to show intermediary steps."""
+
+        scored_df = self.checkbox_chart(info_type, college_types)
+        bool_cols = scored_df["var_name"].tolist()
+        columns = [self.var_names.index(var_name) for var_name in bool_cols]
+
+        with self.lock:
+            num_apps, option_counts = self.set_counts(college_types, columns = columns)
+            has_apps = num_apps > 0
+            respondents = self.respondents[has_apps]
+
+        share_df = pd.DataFrame(
+            (option_counts[:, has_apps] / num_apps[has_apps]).T,
+            index = respondents,
+            columns = bool_cols,
+        )
+        share_df["num_apps"] = num_apps[has_apps]
+
+        return share_df
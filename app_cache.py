@@ -0,0 +1,56 @@
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    """Bounded cache that evicts the least recently used result first.
+
+    Caches are shared by all sessions of the app, which run in separate threads, so every access holds a lock."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached result for key, or None if there is none."""
+
+        with self.lock:
+            if key not in self.results:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.results.move_to_end(key)
+
+            return self.results[key]
+
+    def put(self, key, result):
+        with self.lock:
+            self.results[key] = result
+            self.results.move_to_end(key)
+
+            while len(self.results) > self.maxsize:
+                self.results.popitem(last = False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+
+    def stats(self):
+        """Counts of hits, misses and evictions since the app started, and the current number of cached results."""
+
+        with self.lock:
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self.results),
+                "maxsize": self.maxsize,
+            }
+
+        return stats
@@ -13,8 +13,8 @@ def feature_college(db):
     # Let user select a college
     selected_college_index = st.selectbox(
         "College Name",
-        options = db.colleges.sort_values("name").index.tolist(),
-        format_func = lambda idx: db.colleges.iloc[idx].loc["name"]
+        options = db.college_index.sorted_college_positions,
+        format_func = lambda idx: db.college_index.college_names[idx]
     )
 
     # Display college's location
@@ -25,21 +25,15 @@ def feature_college(db):
     st.markdown(f"Location: {locn}")
 
     # Display number of applicants
-    num_applicants = (
-        db.main
-        .loc[db.main["name"] == name, :]
-        .shape[0]
-    )
+    num_applicants = db.college_index.num_applicants(name)
     st.markdown(f"Number of respondents who applied: {num_applicants}")
 
-    total_applicants = db.main.drop_duplicates("respondent_code", keep = "first").shape[0]
+    total_applicants = db.college_index.total_respondents
     perc_applicants = agf.add_perc_symbol(num_applicants / total_applicants * 100)
     st.markdown(f"Percentage of respondents who applied: {perc_applicants}")
 
     # Obtain statistics for that college
-    one_college_stats = db.college_stats.loc[
-        db.college_stats["name"] == name,
-    ]
+    one_college_stats = db.college_index.stats_rows(db.college_stats, name)
 
     # Function to make a chart for a particular info_type
     def college_info_bar_chart(info_type):
@@ -59,9 +53,7 @@ def feature_college(db):
             right = db.ddict[["var_name", "long_name", "is_other"]]
         )
 
-        filtered_df["option_type"] = filtered_df["is_other"].apply(
-            lambda x: "Other Option" if x else "Given Option"
-        )
+        filtered_df["option_type"] = agf.map_labels(filtered_df["is_other"], "Other Option", "Given Option")
 
         filtered_df["perc"] = filtered_df["num_students"] / num_applicants * 100
         filtered_df["perc_str"] = agf.make_perc_col(filtered_df["perc"])
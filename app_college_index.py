@@ -0,0 +1,56 @@
+import pandas as pd
+import numpy as np
+
+class CollegeIndex:
+    """Positions of each college's rows in db.main and db.college_stats, for the College Info Charts page.
+
+    Rows are grouped by college name like a CSR matrix: the rows of main are ordered by name once, and each name maps to the start and end of its rows in that order. Looking up a college then only touches its own rows. Rows without a name are left out, as groupby() leaves them out."""
+
+    def __init__(self, main, college_stats, colleges):
+        # Only the number of rows of each college in main is needed, so the ordered positions are not kept.
+        main_order, self.main_slices = self.name_slices(main["name"])
+
+        self.stats_order, self.stats_slices = self.name_slices(college_stats["name"])
+
+        self.total_respondents = main["respondent_code"].nunique(dropna = False)
+
+        # Options of the college selectbox, sorted by name
+        self.college_names = colleges["name"].to_numpy()
+        self.sorted_college_positions = colleges.sort_values("name").index.tolist()
+
+    @staticmethod
+    def name_slices(names):
+        """Positions of the rows with a name, grouped by name, and a map of each name to the start and end of its run in that order.
+
+        The integer codes of the names are sorted instead of the names themselves, since strings and missing values cannot be compared. The stable sort keeps each name's rows in their original order."""
+
+        codes, unique_names = pd.factorize(names.to_numpy(dtype = object))
+
+        # Missing names have code -1.
+        has_name = np.flatnonzero(codes >= 0)
+        order = has_name[np.argsort(codes[has_name], kind = "stable")]
+
+        counts = np.bincount(codes[has_name], minlength = len(unique_names))
+        stops = np.cumsum(counts)
+        starts = stops - counts
+
+        slices = {
+            name: (start, stop)
+            for name, start, stop in zip(unique_names, starts.tolist(), stops.tolist())
+        }
+
+        return order, slices
+
+    def num_applicants(self, name):
+        """Number of rows of main for a college."""
+
+        start, stop = self.main_slices.get(name, (0, 0))
+
+        return stop - start
+
+    def stats_rows(self, college_stats, name):
+        """Rows of college_stats for a college, in their original order."""
+
+        start, stop = self.stats_slices.get(name, (0, 0))
+
+        return college_stats.iloc[self.stats_order[start:stop]]
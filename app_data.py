@@ -0,0 +1,853 @@
+"""
+Data sources and data preparation for the College Applications Dashboard.
+
+The app reads three sheets: `main`, `colleges` and `ddict` (the data dictionary). They can come from one of these backends, chosen in the app's secrets:
+
+    [data_source]
+    backend = "gsheets"             # default. Query the private Google Sheets file.
+    # backend = "local"             # read a local snapshot instead
+    # path = "./private/snapshot"   # folder of Parquet files, or a .sqlite file
+    # analytics_snapshot = "./private/analytics_snapshot.arrow"   # if set, load everything from this prebuilt file
+    # shared_snapshot = "/dev/shm/college_apps_dashboard.arrow"   # if set, all of the app's processes share one memory-mapped copy of the tables
+    # refresh_seconds = 300         # how often the app checks the data for changes. 0 turns this off.
+
+Commands, run from the repository root:
+    python app_data.py sync    # refresh the local snapshot from Google Sheets
+    python app_data.py build   # build the analytics snapshot from the selected backend
+    python app_data.py report  # show how much memory each table uses, with and without compact dtypes
+
+The analytics snapshot holds every table that the app uses, already prepared by build_db(). With it, starting the app only opens and memory-maps one file.
+
+When several app processes run behind a load balancer, shared_snapshot makes them share one analytics snapshot: the first process builds it from the selected backend, and the others memory-map the same file instead of building their own copy. Each process still keeps private memory for its imports, object columns and indexes, about 160 MB at 200k rows (see bench_shared() in bench_app.py), so memory does not fall in proportion to the number of processes.
+"""
+
+import os
+import json
+import time
+import struct
+import hashlib
+import sqlite3
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# File locks are only available on POSIX systems.
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app_ranking import RankingEngine
+from app_options import OptionIndex
+from app_aggregates import OverviewStore
+from app_college_index import CollegeIndex
+from app_indicators import IndicatorStore, indicator_vars
+
+DEFAULT_SNAPSHOT_PATH = "./private/snapshot"
+DEFAULT_ANALYTICS_PATH = "./private/analytics_snapshot.arrow"
+
+# Layout of analytics snapshot files. Increase this whenever the layout or the derived tables change.
+ANALYTICS_FORMAT_VERSION = 4
+ANALYTICS_MAGIC = b"CADSNAP1"
+
+# Arrow buffers have to start at 64-byte boundaries to be read without copying.
+ANALYTICS_ALIGNMENT = 64
+
+class GSheetsSource:
+    """Read each sheet from the private Google Sheets file.
+
+    The sheets are fetched at the same time, in a thread pool, since most of the time is spent waiting for Google. gsheetsdb downloads and decodes the whole result of a query before it returns any row, so rows cannot be streamed; they are fetched with one fetchall() and turned into a DataFrame at once. The fetch and parse time of each sheet is kept in self.timings."""
+
+    def __init__(self, credentials_info, sheets_urls):
+        # Imported here so that the local backend works without the Google packages.
+        from google.oauth2 import service_account
+        from gsheetsdb import connect
+
+        self.credentials = service_account.Credentials.from_service_account_info(
+            credentials_info,
+            scopes = [
+                "https://www.googleapis.com/auth/spreadsheets",
+            ],
+        )
+        self.connect = connect
+
+        # Dictionary containing sheet names and their respective URLs
+        self.sheets_urls = dict(sheets_urls)
+
+        # Dictionary containing sheet names and the timings of their last load
+        self.timings = {}
+
+    def load_sheets(self):
+        """Return a dictionary of sheet names and DataFrames."""
+
+        with ThreadPoolExecutor(max_workers = max(1, len(self.sheets_urls))) as executor:
+            futures = {
+                sheet_name: executor.submit(self.load_sheet, url)
+                for sheet_name, url in self.sheets_urls.items()
+            }
+
+            sheets = {}
+            for sheet_name, future in futures.items():
+                sheets[sheet_name], self.timings[sheet_name] = future.result()
+
+        return sheets
+
+    def revision(self):
+        """Cheap signal of changes to the sheets: the number of rows of each sheet.
+
+        Google Sheets does not give a revision number through this connection, so edits that keep the number of rows are not seen."""
+
+        with ThreadPoolExecutor(max_workers = max(1, len(self.sheets_urls))) as executor:
+            futures = {
+                sheet_name: executor.submit(self.count_rows, url)
+                for sheet_name, url in self.sheets_urls.items()
+            }
+
+            return {
+                sheet_name: (future.result(), None)
+                for sheet_name, future in futures.items()
+            }
+
+    def count_rows(self, url):
+        """Number of rows of one sheet, without downloading them."""
+
+        conn = self.connect(credentials = self.credentials)
+
+        cursor = conn.execute(
+            f'SELECT COUNT(*) FROM "{url}"',
+            headers = 1,
+        )
+
+        return int(cursor.fetchone()[0])
+
+    def load_new_rows(self, sheet_name, start):
+        """Return the rows of a sheet from position start onwards."""
+
+        df, timings = self.load_sheet(self.sheets_urls[sheet_name], start = start)
+        self.timings[sheet_name] = timings
+
+        return df
+
+    def load_sheet(self, url, start = 0):
+        """Return the DataFrame of one sheet, from row position start onwards, and its number of rows and fetch and parse times in seconds."""
+
+        # Each thread uses its own connection, since connections are not meant to be shared between threads.
+        conn = self.connect(credentials = self.credentials)
+
+        # Query the Google Sheets file.
+        query = f'SELECT * FROM "{url}"'
+        if start > 0:
+            query = f"{query} OFFSET {start}"
+
+        # The query downloads and decodes every row, so this is the time spent waiting for Google.
+        t0 = time.perf_counter()
+        cursor = conn.execute(
+            query,
+            headers = 1,
+        )
+        rows = cursor.fetchall()
+        fetch_seconds = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        df = pd.DataFrame.from_records(rows, columns = [description[0] for description in cursor.description])
+        parse_seconds = time.perf_counter() - t0
+
+        timings = {
+            "rows": len(df),
+            "fetch_seconds": fetch_seconds,
+            "parse_seconds": parse_seconds,
+        }
+
+        return df, timings
+
+class LocalSource:
+    """Read each sheet from a local snapshot made by save_snapshot()."""
+
+    def __init__(self, path = DEFAULT_SNAPSHOT_PATH):
+        self.path = path
+
+    def load_sheets(self):
+        """Return a dictionary of sheet names and DataFrames."""
+
+        sheets = {}
+
+        if self.path.endswith(".sqlite"):
+            conn = sqlite3.connect(self.path)
+            for sheet_name in self.table_names(conn):
+                sheets[sheet_name] = pd.read_sql_query(f'SELECT * FROM "{sheet_name}"', conn)
+            conn.close()
+
+        else:
+            for sheet_name, file_path in self.sheet_files().items():
+                sheets[sheet_name] = pd.read_parquet(file_path)
+
+        return sheets
+
+    @staticmethod
+    def table_names(conn):
+        """Names of the tables of a SQLite snapshot."""
+
+        return [
+            row[0]
+            for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        ]
+
+    def sheet_files(self):
+        """Dictionary of sheet names and the paths of their Parquet files."""
+
+        sheet_files = {}
+
+        for file_name in sorted(os.listdir(self.path)):
+            sheet_name, extension = os.path.splitext(file_name)
+            if extension == ".parquet":
+                sheet_files[sheet_name] = os.path.join(self.path, file_name)
+
+        return sheet_files
+
+    def revision(self):
+        """Cheap signal of changes to the sheets: the number of rows of each sheet, and for Parquet files, the modification time of the file. Only metadata is read.
+
+        All tables of a SQLite snapshot share one file, so only their numbers of rows are compared."""
+
+        if self.path.endswith(".sqlite"):
+            conn = sqlite3.connect(self.path)
+            revision = {
+                sheet_name: (conn.execute(f'SELECT COUNT(*) FROM "{sheet_name}"').fetchone()[0], None)
+                for sheet_name in self.table_names(conn)
+            }
+            conn.close()
+
+        else:
+            revision = {
+                sheet_name: (pq.ParquetFile(file_path).metadata.num_rows, os.stat(file_path).st_mtime_ns)
+                for sheet_name, file_path in self.sheet_files().items()
+            }
+
+        return revision
+
+    def load_new_rows(self, sheet_name, start):
+        """Return the rows of a sheet from position start onwards."""
+
+        if self.path.endswith(".sqlite"):
+            conn = sqlite3.connect(self.path)
+            df = pd.read_sql_query(f'SELECT * FROM "{sheet_name}" LIMIT -1 OFFSET ?', conn, params = (start,))
+            conn.close()
+
+        else:
+            df = pd.read_parquet(self.sheet_files()[sheet_name]).iloc[start:].reset_index(drop = True)
+
+        return df
+
+def get_source(secrets):
+    """Make the data source selected in the app's secrets. Google Sheets is used if none is selected."""
+
+    config = secrets.get("data_source", {})
+    backend = config.get("backend", "gsheets")
+
+    if backend == "gsheets":
+        source = GSheetsSource(
+            secrets["gcp_service_account"],
+            secrets["private_gsheets_url"],
+        )
+    elif backend == "local":
+        source = LocalSource(config.get("path", DEFAULT_SNAPSHOT_PATH))
+    else:
+        raise ValueError(f"Unknown data source backend: {backend}")
+
+    return source
+
+def save_snapshot(sheets, path = DEFAULT_SNAPSHOT_PATH):
+    """Save a dictionary of sheet names and DataFrames so that LocalSource can read it.
+
+    Each sheet is written to a temporary file first and then moved into place, so the app never reads a half-written sheet."""
+
+    if path.endswith(".sqlite"):
+        temp_path = f"{path}.tmp"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+        conn = sqlite3.connect(temp_path)
+        for sheet_name, df in sheets.items():
+            df.to_sql(sheet_name, conn, index = False)
+        conn.close()
+
+        os.replace(temp_path, path)
+
+    else:
+        os.makedirs(path, exist_ok = True)
+
+        for sheet_name, df in sheets.items():
+            file_path = os.path.join(path, f"{sheet_name}.parquet")
+            df.to_parquet(f"{file_path}.tmp", index = False)
+            os.replace(f"{file_path}.tmp", file_path)
+
+    return None
+
+def build_db(sheets, compact = True):
+    """Prepare the data used by the app from the `main`, `colleges` and `ddict` sheets.
+
+    If compact is True, db.main is stored with compact_main() after the other tables are made from it, and its option and location columns are moved into db.indicators, a long table of the positions of their True values. Otherwise they stay in db.main as bool columns."""
+
+    # The tables are collected in a dictionary and put into db with make_db() at the end, like read_analytics_snapshot() does.
+    tables = {sheet_name: df.copy() for sheet_name, df in sheets.items()}
+
+    tables["main"] = prepare_main(tables["main"], tables["colleges"], tables["ddict"])
+
+    # Make new sheet with number of applications per student
+    tables["apps"] = (
+        tables["main"]
+        .pivot_table(
+            index = ["respondent_code", "college_type"],
+            values = "index",
+            aggfunc = "count",
+        )
+        .reset_index(drop = False)
+        .rename(columns = {"index": "num_apps"})
+    )
+
+    # Option and location columns, stored sparsely
+    indicators = IndicatorStore.from_frame(tables["main"], indicator_vars(tables["ddict"]))
+
+    # Make new sheet with number of students who chose each option in each college
+    checkbox_info_types = ["interests", "characteristics"]
+    reference_df = tables["ddict"].loc[
+        tables["ddict"]["info_type"].isin(checkbox_info_types)
+    ]
+    bool_cols = reference_df.loc[:, "var_name"].tolist()
+
+    tables["college_stats"] = melted_group_sums(indicators, tables["main"]["name"], bool_cols, "name", "num_students")
+
+    # Number of applications to each college
+    tables["college_summary"] = (
+        tables["main"]
+        .groupby(["name", "location", "college_type"], sort = True)
+        .size()
+        .reset_index(name = "num_applicants")
+    )
+
+    # Number of applications for which each option was chosen, per college type
+    tables["option_summary"] = melted_group_sums(indicators, tables["main"]["college_type"], bool_cols, "college_type", "num_applications")
+
+    if compact:
+        tables["main"] = compact_main(tables["main"].drop(columns = indicators.var_names))
+        tables["indicators"] = indicators.to_table()
+
+    db = make_db(tables)
+
+    return db
+
+def melted_group_sums(indicators, keys, var_names, key_name, value_name):
+    """Sum indicator columns within the groups of rows that share a key.
+
+    The result has the layout of pd.melt() on a pivot_table() of the sums: one row per variable and key, with keys sorted within each variable. Rows with a missing key are skipped, as they are by pivot_table()."""
+
+    codes, unique_keys = pd.factorize(keys.to_numpy(dtype = object), sort = True)
+    num_groups = len(unique_keys)
+
+    # Missing keys get the code num_groups, which group_sums() skips.
+    codes = np.where(codes < 0, num_groups, codes)
+
+    counts = indicators.group_sums(codes, num_groups, var_names)
+
+    melted_df = pd.DataFrame({
+        key_name: np.tile(unique_keys, len(var_names)),
+        "var_name": np.repeat(np.array(var_names, dtype = object), num_groups),
+        value_name: counts.ravel().astype(np.int64),
+    })
+
+    return melted_df
+
+def prepare_main(main, colleges, ddict):
+    """Cast the columns of the main sheet, merge in the colleges sheet and add a bool column for each location.
+
+    All casts are done in one astype() call, and the location columns are made together as a one-hot array and added with one concat. Adding them one at a time would copy the growing DataFrame for each location and leave it split into one block per column."""
+
+    # Cast columns to appropriate types, based on data dictionary
+    # A SQLite snapshot stores initially_present as 0 and 1, which .loc would read as row labels, so it is made a bool mask first.
+    present = ddict.loc[ddict["initially_present"].astype(bool)]
+    main = main.astype(dict(zip(present["var_name"], present["primitive_type"])))
+
+    # Merge colleges sheet into main sheet
+    main = (
+        main
+        .merge(
+            right = colleges,
+            on = "name",
+            how = "left",
+        )
+    )
+
+    # Pivot out the locations into bool columns
+    unique_locs = ddict.loc[
+        ddict["info_type"] == "location"
+    ]
+
+    # Several location variables may share a long name, so each variable is matched to the code of its long name.
+    # Locations that are missing or not in the data dictionary get code -1, which matches no variable.
+    long_names = unique_locs["long_name"].drop_duplicates()
+    location_codes = pd.Categorical(main["location"], categories = long_names).codes
+    var_codes = pd.Index(long_names).get_indexer(unique_locs["long_name"])
+
+    location_df = pd.DataFrame(
+        location_codes[:, np.newaxis] == var_codes[np.newaxis, :],
+        columns = unique_locs["var_name"].tolist(),
+        index = main.index,
+    )
+
+    existing_columns = main.columns.intersection(location_df.columns)
+    if len(existing_columns) > 0:
+        main = main.drop(columns = existing_columns)
+
+    # The merge already made a new DataFrame, so its blocks are only joined, not copied again.
+    main = pd.concat([main, location_df], axis = 1, copy = False)
+
+    return main
+
+# String columns of db.main that repeat the same few values
+CATEGORICAL_COLUMNS = ["name", "respondent_code", "location", "college_type"]
+
+def compact_main(main):
+    """Store db.main in fewer bytes.
+
+    Repeated strings become categoricals, which store each distinct string once and an integer code per row. The row index becomes int32. Bool columns are kept as they are; build_db() moves the option and location columns out of db.main before compacting it. The columns are put into one new DataFrame at once, which also joins the many blocks left by adding columns one at a time."""
+
+    columns = {}
+
+    for col in main.columns:
+        series = main[col]
+
+        if col in CATEGORICAL_COLUMNS:
+            series = series.astype("category")
+        elif col == "index" and series.abs().max() < 2 ** 31:
+            series = series.astype(np.int32)
+
+        columns[col] = series
+
+    return pd.DataFrame(columns, index = main.index)
+
+def memory_report(db, before = None):
+    """Deep memory usage of each table in db, in megabytes. If `before` is another db, its usage is shown next to it."""
+
+    def table_megabytes(tables):
+        return pd.Series({
+            table_name: df.memory_usage(deep = True).sum() / 1e6
+            for table_name, df in tables.items()
+            if isinstance(df, pd.DataFrame)
+        })
+
+    report_df = pd.DataFrame({"megabytes": table_megabytes(db)})
+
+    if before is not None:
+        report_df.insert(0, "megabytes_before", table_megabytes(before))
+        report_df["ratio"] = (report_df["megabytes"] / report_df["megabytes_before"]).round(3)
+
+    return report_df
+
+def add_indexes(db, arrays = None):
+    """Attach the lookup structures that are built from the tables in db, but are not tables themselves.
+
+    These are rebuilt at load time instead of being saved in the analytics snapshot, except for the arrays of the overview store, which can be given in `arrays` from read_snapshot_arrays()."""
+
+    db["indicator_store"] = load_indicators(db)
+    db["ranking"] = RankingEngine(db.main, db.indicator_store, db.ddict)
+    db["options"] = OptionIndex(db.indicator_store, db.ddict)
+
+    if arrays:
+        db["overview"] = OverviewStore.from_arrays(db.ddict, arrays)
+    else:
+        db["overview"] = OverviewStore(db.ddict).update(db.main, db.indicator_store)
+    db["college_index"] = CollegeIndex(db.main, db.college_stats, db.colleges)
+
+    return db
+
+def load_indicators(db):
+    """IndicatorStore of db.main, from db.indicators if db.main was compacted, or else from the bool columns of db.main."""
+
+    var_names = indicator_vars(db.ddict)
+
+    if "indicators" in db:
+        return IndicatorStore.from_table(db.indicators, var_names, len(db.main))
+
+    return IndicatorStore.from_frame(db.main, var_names)
+
+def append_rows(db, new_rows):
+    """Return a new db with rows added to the end of the main sheet. db must come from add_indexes(), and is not modified, so sessions that still use it are not affected.
+
+    The tables of the new rows are built by build_db() and combined with the existing tables, which are much smaller than db.main. The overview store is updated with only the new rows. The other indexes are rebuilt, since they are quick to build."""
+
+    compact = "indicators" in db
+    new_db = build_db(
+        {"main": new_rows, "colleges": db.colleges, "ddict": db.ddict},
+        compact = compact,
+    )
+
+    var_names = db.indicator_store.var_names
+    if compact:
+        new_indicators = IndicatorStore.from_table(new_db.indicators, var_names, len(new_db.main))
+    else:
+        new_indicators = IndicatorStore.from_frame(new_db.main, var_names)
+
+    checkbox_vars = db.ddict.loc[db.ddict["info_type"].isin(["interests", "characteristics"]), "var_name"].tolist()
+
+    tables = {
+        "main": concat_main(db.main, new_db.main),
+        "colleges": db.colleges,
+        "ddict": db.ddict,
+        "apps": add_counts(db.apps, new_db.apps, ["respondent_code", "college_type"], "num_apps"),
+        "college_stats": add_melted_counts(db.college_stats, new_db.college_stats, "name", "num_students", checkbox_vars),
+        "college_summary": add_counts(db.college_summary, new_db.college_summary, ["name", "location", "college_type"], "num_applicants"),
+        "option_summary": add_melted_counts(db.option_summary, new_db.option_summary, "college_type", "num_applications", checkbox_vars),
+    }
+
+    indicator_store = db.indicator_store.append(new_indicators)
+    if compact:
+        tables["indicators"] = indicator_store.to_table()
+
+    # The same indexes as add_indexes(), except that the overview store is updated instead of rebuilt.
+    tables["indicator_store"] = indicator_store
+    tables["ranking"] = RankingEngine(tables["main"], indicator_store, db.ddict)
+    tables["options"] = OptionIndex(indicator_store, db.ddict)
+    tables["overview"] = db.overview.copy().update(new_db.main, new_indicators)
+    tables["college_index"] = CollegeIndex(tables["main"], tables["college_stats"], db.colleges)
+
+    return make_db(tables)
+
+def make_db(tables):
+    """Series of tables and indexes, like the db of build_db().
+
+    pandas turns a DataFrame that is put into a Series into an array first, which is slow for large tables. The values are put one at a time into an object array instead, which keeps them as they are."""
+
+    values = np.empty(len(tables), dtype = object)
+    for i, value in enumerate(tables.values()):
+        values[i] = value
+
+    return pd.Series(values, index = list(tables))
+
+def concat_main(main, new_main):
+    """Rows of new_main added to the end of main. Categorical columns stay categorical: the categories of main are kept, so its codes are not recomputed, and new values are added after them."""
+
+    columns = {}
+
+    for col in main.columns:
+        series = main[col]
+        new_series = new_main[col]
+
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            new_values = new_series.astype(object)
+            added = pd.Index(new_values.dropna().unique()).difference(series.cat.categories)
+            categories = series.cat.categories.append(added)
+
+            series = series.cat.set_categories(categories)
+            new_series = pd.Series(pd.Categorical(new_values, categories = categories))
+
+        columns[col] = pd.concat([series, new_series], ignore_index = True)
+
+    return pd.DataFrame(columns)
+
+def add_counts(counts_df, new_counts_df, keys, value_name):
+    """Add the counts of two tables with one row per key, keeping the rows sorted by key like groupby() and pivot_table()."""
+
+    added_df = (
+        pd.concat([counts_df, new_counts_df], ignore_index = True)
+        .groupby(keys, sort = True)[value_name]
+        .sum()
+        .reset_index(drop = False)
+    )
+
+    return added_df
+
+def add_melted_counts(counts_df, new_counts_df, key_name, value_name, var_names):
+    """Add the counts of two tables made by melted_group_sums(), keeping its layout: variables in var_names order, then sorted keys."""
+
+    added_df = add_counts(counts_df, new_counts_df, ["var_name", key_name], value_name)
+
+    # The stable sort keeps the keys sorted within each variable.
+    var_positions = added_df["var_name"].map({var_name: j for j, var_name in enumerate(var_names)})
+    added_df = (
+        added_df
+        .iloc[np.argsort(var_positions.to_numpy(), kind = "stable")]
+        .reset_index(drop = True)
+        [[key_name, "var_name", value_name]]
+    )
+
+    return added_df
+
+def hash_sheets(sheets):
+    """Hash the contents of the sheets, to identify the data that a snapshot was built from."""
+
+    digest = hashlib.sha256()
+
+    for sheet_name in sorted(sheets):
+        df = sheets[sheet_name]
+        digest.update(sheet_name.encode("utf-8"))
+        digest.update(json.dumps([str(col) for col in df.columns]).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(df, index = False).to_numpy().tobytes())
+
+    return digest.hexdigest()[:16]
+
+def row_signature(df, position):
+    """Short hash of the values of one row of a sheet, to check that a row that was already loaded did not change.
+
+    A few rows read on their own may get other dtypes than the whole sheet, so values are hashed by what they are rather than by their dtype: missing values are all the same, and numbers are compared as floats."""
+
+    values = []
+    for col in df.columns:
+        value = df[col].iat[position]
+
+        if pd.isna(value):
+            value = None
+        elif isinstance(value, (bool, np.bool_)):
+            value = bool(value)
+        elif isinstance(value, (int, float, np.number)):
+            value = float(value)
+        else:
+            value = str(value)
+
+        values.append(value)
+
+    signature = json.dumps([[str(col) for col in df.columns], values])
+
+    return hashlib.sha256(signature.encode("utf-8")).hexdigest()[:16]
+
+def write_analytics_snapshot(db, path, data_version, arrays = None):
+    """Save every table in db into one file that read_analytics_snapshot() can memory-map.
+
+    The file starts with a magic string, the length of a JSON manifest, and the manifest itself. Each table follows as an Arrow IPC file, at the offset listed in the manifest. NumPy arrays in the dictionary `arrays` follow as raw bytes, with their dtype and shape in the manifest, so that read_snapshot_arrays() can map them without copying."""
+
+    table_bytes = {}
+    for table_name, df in db.items():
+        # Indexes from add_indexes() are not saved.
+        if not isinstance(df, pd.DataFrame):
+            continue
+
+        sink = pa.BufferOutputStream()
+        table = pa.Table.from_pandas(df, preserve_index = False)
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        table_bytes[table_name] = sink.getvalue().to_pybytes()
+
+    array_bytes = {}
+    for array_name, array in (arrays or {}).items():
+        array = np.ascontiguousarray(array)
+        array_bytes[array_name] = (array.dtype.str, list(array.shape), array.tobytes())
+
+    manifest = {
+        "format_version": ANALYTICS_FORMAT_VERSION,
+        "data_version": data_version,
+        "built_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "tables": {},
+        "arrays": {},
+    }
+
+    def align(offset):
+        return -(-offset // ANALYTICS_ALIGNMENT) * ANALYTICS_ALIGNMENT
+
+    # The manifest stores offsets, which depend on the manifest's own length.
+    # An area is reserved for it, and made larger until the manifest with the resulting offsets fits.
+    manifest_area = align(len(json.dumps(manifest)))
+
+    while True:
+        offset = align(len(ANALYTICS_MAGIC) + 8 + manifest_area)
+
+        for table_name, data in table_bytes.items():
+            manifest["tables"][table_name] = [offset, len(data)]
+            offset = align(offset + len(data))
+
+        for array_name, (dtype, shape, data) in array_bytes.items():
+            manifest["arrays"][array_name] = [offset, dtype, shape]
+            offset = align(offset + len(data))
+
+        manifest_bytes = json.dumps(manifest).encode("utf-8")
+
+        if len(manifest_bytes) <= manifest_area:
+            break
+
+        manifest_area = align(len(manifest_bytes))
+
+    manifest_bytes = manifest_bytes.ljust(manifest_area)
+
+    # Write to a temporary file first, so that the app never reads a half-written snapshot.
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(ANALYTICS_MAGIC)
+        file.write(struct.pack("<Q", len(manifest_bytes)))
+        file.write(manifest_bytes)
+        for table_name, data in table_bytes.items():
+            file.seek(manifest["tables"][table_name][0])
+            file.write(data)
+        for array_name, (dtype, shape, data) in array_bytes.items():
+            file.seek(manifest["arrays"][array_name][0])
+            file.write(data)
+
+    os.replace(temp_path, path)
+
+    return manifest
+
+def read_snapshot_manifest(path):
+    """Read only the manifest of an analytics snapshot."""
+
+    with open(path, "rb") as file:
+        magic = file.read(len(ANALYTICS_MAGIC))
+        if magic != ANALYTICS_MAGIC:
+            raise ValueError(f"{path} is not an analytics snapshot.")
+
+        (manifest_length,) = struct.unpack("<Q", file.read(8))
+        manifest = json.loads(file.read(manifest_length))
+
+    if manifest["format_version"] != ANALYTICS_FORMAT_VERSION:
+        raise ValueError(
+            f"{path} has snapshot format version {manifest['format_version']}, but this app reads version {ANALYTICS_FORMAT_VERSION}. Run `python app_data.py build` again."
+        )
+
+    return manifest
+
+def read_analytics_snapshot(path = DEFAULT_ANALYTICS_PATH):
+    """Memory-map an analytics snapshot and return its tables in the same form as build_db()."""
+
+    manifest = read_snapshot_manifest(path)
+
+    mapped = pa.memory_map(path, "r")
+
+    db = {}
+    for table_name, (offset, length) in manifest["tables"].items():
+        # Reads from a memory map are slices of the mapped file, not copies.
+        mapped.seek(offset)
+        buffer = mapped.read_buffer(length)
+        table = pa.ipc.open_file(buffer).read_all()
+        db[table_name] = table.to_pandas(split_blocks = True)
+
+    # make_db() keeps the tables as they are. pd.Series(db) would turn each of them into an array first.
+    db = make_db(db)
+
+    return db
+
+def read_snapshot_arrays(path):
+    """Memory-map the NumPy arrays of an analytics snapshot. The arrays are read-only views of the file."""
+
+    manifest = read_snapshot_manifest(path)
+
+    if len(manifest["arrays"]) == 0:
+        return {}
+
+    mapped = np.memmap(path, dtype = np.uint8, mode = "r")
+
+    arrays = {}
+    for array_name, (offset, dtype, shape) in manifest["arrays"].items():
+        dtype = np.dtype(dtype)
+        num_bytes = int(np.prod(shape)) * dtype.itemsize
+        arrays[array_name] = mapped[offset:offset + num_bytes].view(dtype).reshape(shape)
+
+    return arrays
+
+def source_version(revision):
+    """Short hash of the revision signal of a data source, used as the data version of a shared snapshot."""
+
+    return hashlib.sha256(json.dumps(revision, sort_keys = True).encode("utf-8")).hexdigest()[:16]
+
+def load_shared_db(source, path, revision = None):
+    """Load db, with its indexes, from an analytics snapshot that is shared by all of the app's processes, building it first if it is missing or out of date.
+
+    The snapshot is memory-mapped, so every process reads the same pages of the operating system's page cache instead of keeping its own copy of the tables. On a tmpfs such as /dev/shm, the file never touches the disk. The arrays of the overview store are saved in the snapshot too, so that processes map them instead of counting the options again.
+
+    The snapshot is out of date when its data version differs from the source's current revision. The first process to find that rebuilds it while holding a lock on path + ".lock", and the others wait for it and then map the new file. The lock is only available on POSIX systems; elsewhere, each process that finds the snapshot out of date rebuilds it."""
+
+    if revision is None:
+        revision = source.revision()
+    data_version = source_version(revision)
+
+    with open(f"{path}.lock", "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        # Another process may have rebuilt the snapshot while this one waited for the lock.
+        try:
+            is_current = read_snapshot_manifest(path)["data_version"] == data_version
+        except (OSError, ValueError):
+            is_current = False
+
+        if not is_current:
+            save_db_snapshot(build_db(source.load_sheets()), path, data_version)
+
+    db = load_db_snapshot(path)
+
+    return db
+
+def save_db_snapshot(db, path, data_version):
+    """Save the tables of db from build_db() into an analytics snapshot, with the arrays of its overview store."""
+
+    overview = OverviewStore(db.ddict).update(db.main, load_indicators(db))
+
+    return write_analytics_snapshot(db, path, data_version, arrays = overview.to_arrays())
+
+def load_db_snapshot(path):
+    """Memory-map an analytics snapshot and attach the indexes of db, using the saved arrays of the overview store."""
+
+    return add_indexes(read_analytics_snapshot(path), arrays = read_snapshot_arrays(path))
+
+def load_db(secrets):
+    """Load the data used by the app, either from a prebuilt analytics snapshot or by building it from the sheets."""
+
+    config = secrets.get("data_source", {})
+
+    if "analytics_snapshot" in config:
+        db = load_db_snapshot(config["analytics_snapshot"])
+    elif "shared_snapshot" in config:
+        db = load_shared_db(get_source(secrets), config["shared_snapshot"])
+    else:
+        sheets = get_source(secrets).load_sheets()
+        db = add_indexes(build_db(sheets))
+
+    return db
+
+if __name__ == "__main__":
+    import streamlit as st
+
+    parser = argparse.ArgumentParser(description = "Manage the local copies of the app's data.")
+    parser.add_argument(
+        "command",
+        choices = ["sync", "build", "report"],
+        help = "sync: download every sheet from Google Sheets into the local snapshot. build: prepare every table used by the app and save them into the analytics snapshot. report: show the memory used by each table.",
+    )
+    parser.add_argument("--path", default = None, help = "Output path. Defaults to the path in the app's secrets.")
+    args = parser.parse_args()
+
+    # st.secrets reads .streamlit/secrets.toml even outside of a running app.
+    config = st.secrets.get("data_source", {})
+
+    if args.command == "sync":
+        path = args.path or config.get("path", DEFAULT_SNAPSHOT_PATH)
+
+        source = GSheetsSource(
+            st.secrets["gcp_service_account"],
+            st.secrets["private_gsheets_url"],
+        )
+
+        sheets = source.load_sheets()
+        save_snapshot(sheets, path)
+
+        for sheet_name, timings in source.timings.items():
+            print(f"{sheet_name}: {timings['rows']} rows, fetched in {timings['fetch_seconds']:.2f} s, parsed in {timings['parse_seconds']:.2f} s")
+        print(f"Saved snapshot to {path}")
+
+    elif args.command == "build":
+        path = args.path or config.get("analytics_snapshot", DEFAULT_ANALYTICS_PATH)
+
+        sheets = get_source(st.secrets).load_sheets()
+        db = build_db(sheets)
+        manifest = save_db_snapshot(db, path, data_version = hash_sheets(sheets))
+
+        for table_name, df in db.items():
+            print(f"{table_name}: {df.shape[0]} rows")
+        print(f"Saved analytics snapshot version {manifest['data_version']} to {path}")
+
+    elif args.command == "report":
+        sheets = get_source(st.secrets).load_sheets()
+
+        db = build_db(sheets)
+        db_before = build_db(sheets, compact = False)
+
+        print(memory_report(db, before = db_before).to_string())
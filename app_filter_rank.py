@@ -5,6 +5,9 @@ import altair as alt
 
 import app_general_functions as agf
 
+# Number of colleges shown on each page of the list of rankings
+RESULTS_PER_PAGE = 10
+
 def feature_filter_rank(db):
 
     st.markdown("## Filter and Rank Colleges")
@@ -17,20 +20,13 @@ def feature_filter_rank(db):
 
         str_college_types, set_college_types = agf.select_college_types(st_key = "filter_rank")
 
-        set_exclude_college_types = set(["local", "international"]) - set_college_types
-
         checkbox_info_types = ["location", "interests", "characteristics"]
 
         checkbox_selections = {}
 
         final_info_types = []
 
-        ddict_location_mask = (
-            (db.ddict["info_type"] == "location")
-            & (db.ddict["college_type"].isin(set_college_types))
-        )
-        
-        selected_locations = db.ddict.loc[ddict_location_mask, "var_name"].tolist()
+        selected_locations = db.options.locations(set_college_types)
 
         for info_type in checkbox_info_types:
             st.markdown(f"### {info_type.title()}")
@@ -46,28 +42,8 @@ def feature_filter_rank(db):
             if any_or_specific == choose_specific:
                 final_info_types.append(info_type)
 
-                # Check first which options were actually answered by respondents.
-                all_options = db.ddict.loc[
-                    (db.ddict["info_type"] == info_type),
-                    "var_name",
-                ]
-
-                num_answers_per_option = db.main[all_options].sum(axis = 0)
-                final_options = num_answers_per_option.loc[num_answers_per_option > 0].index.tolist()
-
-                mask = (
-                    (db.ddict["var_name"].isin(final_options))
-                    &
-                    # Note bitwise NOT
-                    ~(db.ddict["college_type"].isin(set_exclude_college_types))
-                )
-
-                reference_df = db.ddict.loc[mask]
-
-                var_to_long_filtered = {
-                    row["var_name"]: row["long_name"]
-                    for index, row in reference_df.iterrows()
-                }
+                # Only options that were actually answered by respondents are shown.
+                var_to_long_filtered = db.options.options(info_type, set_college_types)
 
                 # If user is filtering locations, key of multiselect widget should include the chosen college types.
                 # This way, if the user selects a different set of college types, the location multiselect widget will update its options to include only locations that match those college types.
@@ -92,11 +68,7 @@ def feature_filter_rank(db):
     st.markdown(f"College types: {str_college_types}")
 
     # Dictionary of variable names and corresponding long names
-    # Contains variable names from all of the three relevant info types
-    var_to_long_general = {
-        row["var_name"]: row["long_name"]
-        for index, row in db.ddict.iterrows()
-    }
+    var_to_long_general = db.options.var_to_long
 
     for info_type in checkbox_info_types:
         if info_type in checkbox_selections:
@@ -141,54 +113,20 @@ def feature_filter_rank(db):
     if not st.checkbox("Calculate rankings"):
         st.stop()
 
-    initial_columns = ["index", "respondent_code", "name", "location", "college_type"]
-
-    get_columns = initial_columns + selected_columns
-
     # Remove colleges that are not in the chosen locations
-    location_mask = db.main.loc[:, selected_locations].any(axis = 1)
-
-    rank_df = db.main.loc[location_mask, get_columns]
+    location_mask = db.ranking.college_mask(selected_locations)
 
-    # Warning if rank_df is empty
-    if rank_df.shape[0] == 0:
+    # Warning if no colleges are left
+    if not location_mask.any():
         st.warning("No data is available on colleges in the selected locations. Please select other locations.")
         st.stop()
 
     if no_filter:
         # If no filtering options were chosen, simply rank colleges by number of students.
 
-        coll_type_mask = rank_df["college_type"].isin(set_college_types)
-
-        rank_df = rank_df.loc[coll_type_mask]
-        rank_df["num_students"] = 1
-
-        rank_df = (
-            rank_df.pivot_table(
-                index = ["name", "location"],
-                values = "num_students",
-                aggfunc = "sum",
-            )
-            .reset_index(drop = False)
-        )
-
-        # Add column with rankings. Dense method is used, i.e., minimum rank is used to break ties and rank always increases by 1 between groups of colleges with the same rank.
-        rank_df["rank"] = (
-            rank_df["num_students"]
-            .rank(method = "dense", ascending = False)
-            .astype("int64")
-        )
-        
-        # Sort rows by rank, ascending, so 1 then 2 and so on.
-        rank_df = (
-            rank_df
-            .sort_values("rank", ascending = True)
-            .reset_index(drop = False)
-        )
-
         # Let user select how many colleges to show
 
-        total_num_colleges = rank_df.shape[0]
+        total_num_colleges = int(db.ranking.college_mask(selected_locations, set_college_types).sum())
 
         show_top = agf.select_num_colleges(
             5,
@@ -196,104 +134,122 @@ def feature_filter_rank(db):
             st_key = "no_filter",
         )
 
+        # Rankings use the dense method, i.e., minimum rank is used to break ties and rank always increases by 1 between groups of colleges with the same rank.
+        # Only the colleges that will be shown are sorted.
+        total_num_colleges, rank_df = db.ranking.rank_by_num_students(
+            selected_locations,
+            set_college_types,
+            top_n = show_top,
+        )
+
         st.markdown("---")
 
-        for i, row in rank_df.iterrows():
+        view = agf.select_results_view(st_key = "no_filter")
+
+        if view == "Table":
+            table_df = (
+                rank_df
+                .rename(columns = {
+                    "rank": "Rank",
+                    "name": "College",
+                    "location": "Location",
+                    "num_students": "Number of applicants",
+                })
+                .set_index("Rank")
+                [["College", "Location", "Number of applicants"]]
+            )
+
+            st.dataframe(table_df, use_container_width = True)
 
-            # Placement refers to the ordinal position of the college relative to the other colleges displayed, regardless of ranks and ties. Do not show colleges past the limit set by the user.
-            placement = i + 1
-            if placement > show_top:
-                st.stop()
+        else:
+            # Only the colleges on the selected page are rendered.
+            start, stop = agf.select_page(rank_df.shape[0], RESULTS_PER_PAGE, st_key = "no_filter")
+
+            for row in rank_df.iloc[start:stop].to_dict("records"):
 
-            college_name = row['name']
-            num_students = row["num_students"]
-            locn = row["location"]
-            rank = row["rank"]
+                college_name = row['name']
+                num_students = row["num_students"]
+                locn = row["location"]
+                rank = row["rank"]
 
-            st.markdown(f"{rank}. **{college_name}**")
+                st.markdown(f"{rank}. **{college_name}**")
 
-            with st.expander("More information", expanded = False):
+                with st.expander("More information", expanded = False):
 
-                st.markdown(f"Number of applicants: {num_students}")
-                st.markdown(f"Location: {locn}")
+                    st.markdown(f"Number of applicants: {num_students}")
+                    st.markdown(f"Location: {locn}")
 
     else:
         # Rank using filtering options
 
-        rank_df = (
-            rank_df
-            .pivot_table(
-                index = ["name", "location"],
-                values = selected_columns,
-                aggfunc = "sum",
-            )
-            .reset_index(drop = False)
-        )
+        # Let user select how many colleges to show
 
-        score_cols = []
+        total_num_colleges = int(location_mask.sum())
 
-        for col in selected_columns:
-            # Do min-max scaling and add 0.01 to all numbers to avoid having zeros.
-            min_value = rank_df[col].min()
-            max_value = rank_df[col].max()
-            rng = (max_value - min_value)
+        show_top = agf.select_num_colleges(
+            5,
+            total_num_colleges = total_num_colleges,
+            st_key = "with_filter",
+        )
 
-            score_col_name = f"{col}_score"
-            score_cols.append(score_col_name)
+        # The final score of each college is the product of its min-max scaled option counts.
+        # Only the colleges that will be shown are sorted.
+        total_num_colleges, rank_df = db.ranking.rank_by_options(
+            selected_locations,
+            selected_columns,
+            top_n = show_top,
+        )
 
-            rank_df[score_col_name] = rank_df[col].sub(min_value).div(rng).add(0.01)
+        # Show rankings
 
-        # Calculate final score of each college as the product of its individual scores.
-        rank_df["final_score"] = rank_df[score_cols].product(axis = 1)
+        # Selected options of each info type, in the order of the data dictionary.
+        # The details of every college are looked up here instead of filtering the data dictionary for each college.
+        selected_reference_df = db.ddict.loc[db.ddict["var_name"].isin(selected_columns)]
 
-        # Sort by score
-        rank_df = (
-            rank_df.sort_values("final_score", ascending = False)
-            .reset_index(drop = True)
-        )
+        selected_options = {
+            info_type: list(zip(info_df["var_name"], info_df["long_name"]))
+            for info_type, info_df in selected_reference_df.groupby("info_type", sort = False)
+        }
 
-        # Show rankings
+        view = agf.select_results_view(st_key = "with_filter")
 
-        total_num_colleges = rank_df.shape[0]
+        if view == "Table":
+            table_columns = {"name": "College", "location": "Location"}
+            for info_type in final_info_types:
+                for var_name, long_name in selected_options.get(info_type, []):
+                    table_columns[var_name] = long_name
 
-        show_top = agf.select_num_colleges(
-            5,
-            total_num_colleges = total_num_colleges,
-            st_key = "with_filter",
-        )
+            table_df = rank_df[list(table_columns)].rename(columns = table_columns)
+            table_df.index = pd.RangeIndex(1, table_df.shape[0] + 1, name = "Rank")
 
-        selected_reference_df = db.ddict.loc[db.ddict["var_name"].isin(selected_columns)]
+            st.dataframe(table_df, use_container_width = True)
+
+        else:
+            # Only the colleges on the selected page are rendered.
+            start, stop = agf.select_page(rank_df.shape[0], RESULTS_PER_PAGE, st_key = "with_filter")
 
-        for i, row in rank_df.iterrows():
+            for i, row in zip(range(start, stop), rank_df.iloc[start:stop].to_dict("records")):
 
-            rank = i + 1
-            if rank > show_top:
-                st.stop()
+                rank = i + 1
 
-            college_name = row['name']
+                college_name = row['name']
 
-            st.markdown(f"{rank}. {college_name}")
+                st.markdown(f"{rank}. {college_name}")
 
-            with st.expander(label = "More information", expanded = False):
+                with st.expander(label = "More information", expanded = False):
 
-                for info_type in final_info_types:
+                    for info_type in final_info_types:
 
-                    if info_type == "location":
-                        st.markdown(f"{info_type.title()}: {row['location']}")
+                        if info_type == "location":
+                            st.markdown(f"{info_type.title()}: {row['location']}")
 
-                    else:
-                        st.markdown(f"{info_type.title()}:")
+                        else:
+                            st.markdown(f"{info_type.title()}:")
 
-                        filtered_reference_df = selected_reference_df.loc[
-                            selected_reference_df["info_type"] == info_type
-                        ]
-                        
-                        for j, row_reference in filtered_reference_df.iterrows():
-                            var_name = row_reference["var_name"]
-                            long_name = row_reference['long_name']
-                            num_students = row[var_name]
+                            for var_name, long_name in selected_options.get(info_type, []):
+                                num_students = row[var_name]
 
-                            st.markdown(f"- {long_name}: **{num_students} students**")
+                                st.markdown(f"- {long_name}: **{num_students} students**")
 
-                    # Display a newline to add extra space between sections
-                    st.markdown("\n")
\ No newline at end of file
+                        # Display a newline to add extra space between sections
+                        st.markdown("\n")
@@ -1,8 +1,17 @@
+import hashlib
+
 import pandas as pd
 import numpy as np
 import streamlit as st
 import altair as alt
 
+from app_cache import LRUCache
+
+# Number of chart specs that are kept before evicting the least recently used one
+CHART_CACHE_SIZE = 64
+
+chart_cache = LRUCache(maxsize = CHART_CACHE_SIZE)
+
 def select_college_types(st_key):
     """Let the user select one or both college types."""
 
@@ -30,13 +39,64 @@ def add_perc_symbol(num):
 
     return result
 
-def make_perc_col(series):
-    """Convert a numeric series to a string series with % at the end."""
+# printf-style format of add_perc_symbol(), with the percent symbol included
+# The width of 2 in add_perc_symbol() never pads, since "nan" and "inf" are the shortest strings, so it is left out.
+PERC_FORMAT = "%.2f%%"
+
+def perc_codes(values):
+    """Format each distinct number of an array once, like add_perc_symbol(). Returns the code of each number and the array of distinct strings.
+
+    The strings are made by Python's float formatting, one per distinct number. NumPy's string functions also run once per element, and are slower than this."""
+
+    # Factorize the bits of the numbers, since 0.0 and -0.0 are equal but are formatted differently.
+    codes, uniques = pd.factorize(np.asarray(values, dtype = np.float64).view(np.int64))
+
+    # Python floats are formatted faster than NumPy scalars, and printf-style formatting is faster than str.format().
+    unique_strs = np.empty(len(uniques), dtype = object)
+    unique_strs[:] = list(map(PERC_FORMAT.__mod__, uniques.view(np.float64).tolist()))
 
-    result = series.apply(add_perc_symbol)
+    return codes, unique_strs
+
+def make_perc_col(series, categorical = False):
+    """Convert a numeric series to a string series with % at the end.
+
+    Each distinct number is formatted only once. If categorical is True, the result is a categorical series, which is smaller when numbers repeat."""
+
+    codes, unique_strs = perc_codes(series.to_numpy())
+
+    if not categorical:
+        return pd.Series(unique_strs[codes], index = series.index, name = series.name)
+
+    # Different numbers can give the same string, such as 1.001 and 1.002, so the strings are factorized again.
+    str_codes, categories = pd.factorize(unique_strs)
+
+    result = pd.Series(
+        pd.Categorical.from_codes(str_codes[codes], categories = categories),
+        index = series.index,
+        name = series.name,
+    )
 
     return result
 
+def map_labels(series, true_label, false_label):
+    """Label each value of a series by whether it is true, like `true_label if x else false_label`."""
+
+    result = pd.Series(
+        np.where(series.to_numpy().astype(bool), true_label, false_label).astype(object),
+        index = series.index,
+        name = series.name,
+    )
+
+    return result
+
+def title_col(series):
+    """Title-case a string series, formatting each distinct value only once."""
+
+    codes, uniques = pd.factorize(series)
+    titled = np.append(np.array([value.title() for value in uniques], dtype = object), np.nan)
+
+    return pd.Series(titled[codes], index = series.index, name = series.name)
+
 def select_num_colleges(initial_default, total_num_colleges, st_key):
     final_default = initial_default if total_num_colleges >= initial_default else total_num_colleges
 
@@ -50,7 +110,99 @@ def select_num_colleges(initial_default, total_num_colleges, st_key):
 
     return num_colleges
 
-def chart_of_percentages(df, num_var_title, opt_var_title):
+def select_results_view(st_key):
+    """Let the user choose between a list of colleges with details and a compact table."""
+
+    view = st.radio(
+        label = "Show results as",
+        options = ["List", "Table"],
+        horizontal = True,
+        key = f"select_results_view {st_key}",
+    )
+
+    return view
+
+def select_page(num_items, page_size, st_key):
+    """Let the user select a page of results. Returns the positions of the first item on the page and of the item after the last one."""
+
+    num_pages = -(-num_items // page_size)
+
+    if num_pages <= 1:
+        return 0, num_items
+
+    # The number of pages is part of the key, so that the page resets when the number of results changes.
+    page = st.number_input(
+        label = f"Page (1 to {num_pages})",
+        min_value = 1,
+        max_value = num_pages,
+        value = 1,
+        step = 1,
+        key = f"select_page {st_key} {num_pages}",
+    )
+
+    start = (page - 1) * page_size
+    stop = min(start + page_size, num_items)
+
+    st.caption(f"Showing colleges {start + 1} to {stop} out of {num_items}.")
+
+    return start, stop
+
+def fingerprint_df(df):
+    """Hash the column names, dtypes, index and values of a DataFrame."""
+
+    digest = hashlib.sha256()
+    digest.update(repr(list(zip(df.columns, df.dtypes.astype(str)))).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index = True).to_numpy().tobytes())
+
+    return digest.hexdigest()
+
+def chart_to_spec(chart):
+    """Convert an Altair chart to a Vega-Lite spec the same way st.altair_chart() does. Data is not converted, but kept as DataFrames in spec["datasets"]."""
+
+    datasets = {}
+
+    def name_transform(data):
+        datasets[str(id(data))] = data
+        return {"name": str(id(data))}
+
+    alt.data_transformers.register("dataset_name", name_transform)
+
+    with alt.data_transformers.enable("dataset_name"):
+        spec = chart.to_dict()
+
+    spec["datasets"] = datasets
+
+    return spec
+
+def chart_spec(make_chart, df, **params):
+    """Vega-Lite spec of the Altair chart made by make_chart(df, **params).
+
+    Building and validating an Altair chart takes much longer than displaying it, so specs are cached, keyed by make_chart, a fingerprint of df and params. The same data and parameters reuse the spec of any earlier rerun or session."""
+
+    key = (
+        make_chart.__module__,
+        make_chart.__qualname__,
+        fingerprint_df(df),
+        tuple(sorted(params.items())),
+    )
+
+    spec = chart_cache.get(key)
+    if spec is None:
+        spec = chart_to_spec(make_chart(df, **params))
+        chart_cache.put(key, spec)
+
+    return spec
+
+def show_chart(make_chart, df, use_container_width = True, **params):
+    """Display the Altair chart made by make_chart(df, **params), using a cached spec if there is one."""
+
+    spec = chart_spec(make_chart, df, **params)
+
+    st.vega_lite_chart(spec, use_container_width = use_container_width)
+
+    return None
+
+def make_chart_of_percentages(df, num_var_title, opt_var_title):
     source = alt.Chart(df)
 
     y_sort = alt.EncodingSortField("perc", order = "descending")
@@ -84,7 +236,16 @@ def chart_of_percentages(df, num_var_title, opt_var_title):
     )
     chart = alt.hconcat(bar, text, spacing = 0)
 
+    return chart
+
+def chart_of_percentages(df, num_var_title, opt_var_title):
     st.caption("Hover over each bar for more information.")
-    st.altair_chart(chart, use_container_width = True)
+
+    show_chart(
+        make_chart_of_percentages,
+        df,
+        num_var_title = num_var_title,
+        opt_var_title = opt_var_title,
+    )
 
     return None
\ No newline at end of file
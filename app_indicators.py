@@ -0,0 +1,158 @@
+import pandas as pd
+import numpy as np
+
+# Info types whose variables are bool indicator columns of db.main
+INDICATOR_INFO_TYPES = ["location", "interests", "characteristics"]
+
+def indicator_vars(ddict):
+    """Variable names of the indicator columns, in data dictionary order."""
+
+    return ddict.loc[ddict["info_type"].isin(INDICATOR_INFO_TYPES), "var_name"].tolist()
+
+class IndicatorStore:
+    """Bool indicator columns of db.main, such as options and locations, stored sparsely.
+
+    Like a CSC matrix, the store keeps the sorted positions of the rows where each column is True: the rows of column j are rows[starts[j]:starts[j + 1]]. Most respondents check only a few of the options and every application has one location, so memory grows with the number of checked boxes instead of rows × columns.
+
+    Sums only touch the stored positions. Sums over groups of rows use one np.bincount() per column, which is much faster than np.add.at() or sorting the rows for np.add.reduceat(). OverviewStore and RankingEngine get all of their counts this way."""
+
+    def __init__(self, var_names, starts, rows, num_rows):
+        self.var_names = list(var_names)
+        self.var_positions = {var_name: j for j, var_name in enumerate(self.var_names)}
+        self.starts = starts
+        self.rows = rows
+        self.num_rows = num_rows
+
+    @staticmethod
+    def row_dtype(num_rows):
+        """Smallest integer type that holds every row position."""
+
+        return np.int32 if num_rows < 2 ** 31 else np.int64
+
+    @classmethod
+    def from_frame(cls, df, var_names):
+        """Store the bool columns var_names of a DataFrame. Row positions follow the order of its rows."""
+
+        num_rows = len(df)
+        row_dtype = cls.row_dtype(num_rows)
+
+        # Each column is read once, so only one dense column is in memory at a time.
+        column_rows = [
+            np.flatnonzero(df[var_name].to_numpy(dtype = bool)).astype(row_dtype)
+            for var_name in var_names
+        ]
+
+        starts = np.zeros(len(var_names) + 1, dtype = np.int64)
+        starts[1:] = np.cumsum([len(positions) for positions in column_rows])
+
+        rows = np.concatenate(column_rows) if column_rows else np.zeros(0, dtype = row_dtype)
+
+        return cls(var_names, starts, rows, num_rows)
+
+    @classmethod
+    def from_table(cls, table, var_names, num_rows):
+        """Rebuild a store from the long table made by to_table(). Variables without rows in the table are columns of False."""
+
+        var_name_col = table["var_name"]
+        rows = table["row"].to_numpy()
+
+        if not isinstance(var_name_col.dtype, pd.CategoricalDtype):
+            var_codes = pd.Index(var_names).get_indexer(var_name_col)
+        elif list(var_name_col.cat.categories) == list(var_names):
+            # The codes of a table from to_table() are already the positions of the variables, and are used without a copy.
+            var_codes = var_name_col.cat.codes.to_numpy()
+        else:
+            # Missing values have code -1, which takes the last item, so -1 is added there.
+            category_positions = np.append(pd.Index(var_names).get_indexer(var_name_col.cat.categories), -1)
+            var_codes = category_positions[var_name_col.cat.codes.to_numpy()]
+
+        starts = np.zeros(len(var_names) + 1, dtype = np.int64)
+
+        # A table from to_table() is already in the order of the store, so its rows are used without a copy.
+        code_steps = np.diff(var_codes)
+        in_order = (
+            (len(var_codes) == 0 or var_codes[0] >= 0)
+            and (code_steps >= 0).all()
+            and ((code_steps > 0) | (np.diff(rows) > 0)).all()
+        )
+
+        if in_order:
+            starts[1:] = np.cumsum(np.bincount(var_codes, minlength = len(var_names)))
+            rows = rows.astype(cls.row_dtype(num_rows), copy = False)
+
+            return cls(var_names, starts, rows, num_rows)
+
+        # Otherwise keep the columns in the order of var_names and the rows of each column sorted.
+        keep = var_codes >= 0
+        order = np.lexsort((rows[keep], var_codes[keep]))
+        rows = rows[keep][order].astype(cls.row_dtype(num_rows))
+
+        starts[1:] = np.cumsum(np.bincount(var_codes[keep], minlength = len(var_names)))
+
+        return cls(var_names, starts, rows, num_rows)
+
+    def to_table(self):
+        """Long table with one row per True value: the variable name, as a categorical, and the position of the row in db.main."""
+
+        var_codes = np.repeat(np.arange(len(self.var_names), dtype = np.int32), np.diff(self.starts))
+
+        return pd.DataFrame({
+            "var_name": pd.Categorical.from_codes(var_codes, categories = self.var_names),
+            "row": self.rows,
+        })
+
+    def column_rows(self, var_name):
+        """Sorted positions of the rows where a column is True."""
+
+        j = self.var_positions[var_name]
+
+        return self.rows[self.starts[j]:self.starts[j + 1]]
+
+    def column_sums(self, var_names = None):
+        """Number of True values in each column."""
+
+        counts = np.diff(self.starts)
+
+        if var_names is None:
+            return counts
+
+        return counts[[self.var_positions[var_name] for var_name in var_names]]
+
+    def group_sums(self, group_codes, num_groups, var_names = None):
+        """Number of True values of each column within each group of rows, as an int32 array of columns by groups.
+
+        group_codes gives the group of each row, from 0 to num_groups - 1. Rows with a code of num_groups are skipped."""
+
+        if var_names is None:
+            var_names = self.var_names
+
+        group_codes = np.asarray(group_codes)
+        counts = np.empty((len(var_names), num_groups), dtype = np.int32)
+
+        for i, var_name in enumerate(var_names):
+            counts[i] = np.bincount(group_codes[self.column_rows(var_name)], minlength = num_groups + 1)[:num_groups]
+
+        return counts
+
+    def append(self, other):
+        """New store with the rows of another store with the same columns added after the rows of this one."""
+
+        num_rows = self.num_rows + other.num_rows
+        row_dtype = self.row_dtype(num_rows)
+
+        column_rows = []
+        for var_name in self.var_names:
+            column_rows.append(self.column_rows(var_name).astype(row_dtype))
+            column_rows.append(other.column_rows(var_name).astype(row_dtype) + self.num_rows)
+
+        starts = np.zeros(len(self.var_names) + 1, dtype = np.int64)
+        starts[1:] = self.starts[1:] + other.column_sums(self.var_names).cumsum()
+
+        rows = np.concatenate(column_rows) if column_rows else np.zeros(0, dtype = row_dtype)
+
+        return IndicatorStore(self.var_names, starts, rows, num_rows)
+
+    def nbytes(self):
+        """Bytes used by the arrays of the store."""
+
+        return self.starts.nbytes + self.rows.nbytes
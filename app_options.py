@@ -0,0 +1,62 @@
+from types import MappingProxyType
+
+# Sets of college types that the user can select, as sorted tuples
+COLLEGE_TYPE_SETS = [
+    ("local",),
+    ("international",),
+    ("international", "local"),
+]
+
+class OptionIndex:
+    """Options that can be shown in the widgets of the Filter and Rank Colleges page.
+
+    Everything is computed once when the data is loaded. The maps are read-only because the index is shared by all sessions."""
+
+    def __init__(self, indicators, ddict, info_types = ("location", "interests", "characteristics")):
+        all_vars = ddict.loc[ddict["info_type"].isin(info_types), "var_name"].tolist()
+
+        # Options that at least one respondent answered
+        num_answers_per_option = indicators.column_sums(all_vars)
+        answered = set(var_name for var_name, num_answers in zip(all_vars, num_answers_per_option) if num_answers > 0)
+
+        # Map of every variable name to its long name
+        self.var_to_long = MappingProxyType(dict(zip(ddict["var_name"], ddict["long_name"])))
+
+        answered_options = {}
+        all_locations = {}
+
+        for college_types in COLLEGE_TYPE_SETS:
+            exclude_college_types = set(["local", "international"]) - set(college_types)
+
+            for info_type in info_types:
+                # Options without a college type, such as interests, are kept for every set of college types.
+                mask = (
+                    (ddict["info_type"] == info_type)
+                    & (ddict["var_name"].isin(answered))
+                    & ~(ddict["college_type"].isin(exclude_college_types))
+                )
+
+                answered_options[(info_type, college_types)] = MappingProxyType(dict(zip(
+                    ddict.loc[mask, "var_name"],
+                    ddict.loc[mask, "long_name"],
+                )))
+
+            # All locations of these college types, whether or not they were answered
+            location_mask = (
+                (ddict["info_type"] == "location")
+                & (ddict["college_type"].isin(college_types))
+            )
+            all_locations[college_types] = tuple(ddict.loc[location_mask, "var_name"])
+
+        self.answered_options = MappingProxyType(answered_options)
+        self.all_locations = MappingProxyType(all_locations)
+
+    def options(self, info_type, college_types):
+        """Map of variable names to long names of the answered options of an info type, for a set of college types."""
+
+        return self.answered_options[(info_type, tuple(sorted(college_types)))]
+
+    def locations(self, college_types):
+        """Variable names of all locations of a set of college types."""
+
+        return list(self.all_locations[tuple(sorted(college_types))])
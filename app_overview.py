@@ -16,7 +16,7 @@ def feature_overview(db):
     def chart_respondent_turnout(db = db):
 
         total_g12 = 919
-        num_respondents = db.main["respondent_code"].drop_duplicates().shape[0]
+        num_respondents = db.overview.num_respondents
         num_other = total_g12 - num_respondents
         
         perc_respondents = round((num_respondents / total_g12) * 100, 2)
@@ -38,28 +38,31 @@ def feature_overview(db):
 
         res_df["perc_str"] = agf.make_perc_col(res_df["perc"])
 
-        base = (
-            alt.Chart(res_df)
-            .mark_bar()
-            .encode(
-                x = alt.X("number:Q", title = "Number of Students"),
-                y = alt.Y("responded:N", title = "Responded"),
-                tooltip = [alt.Tooltip("number:Q", title = "Number of Students")],
+        def make_chart(res_df):
+            base = (
+                alt.Chart(res_df)
+                .mark_bar()
+                .encode(
+                    x = alt.X("number:Q", title = "Number of Students"),
+                    y = alt.Y("responded:N", title = "Responded"),
+                    tooltip = [alt.Tooltip("number:Q", title = "Number of Students")],
+                )
             )
-        )
 
-        text = base.mark_text(
-            align = "left",
-            baseline = "middle",
-            # Nudge text to right so it doesn't appear on top of the bar
-            dx = 3,
-        ).encode(
-            text = "perc_str:N"
-        )
+            text = base.mark_text(
+                align = "left",
+                baseline = "middle",
+                # Nudge text to right so it doesn't appear on top of the bar
+                dx = 3,
+            ).encode(
+                text = "perc_str:N"
+            )
+
+            chart = base + text
 
-        chart = base + text
+            return chart
 
-        st.altair_chart(chart, use_container_width = True)
+        agf.show_chart(make_chart, res_df)
 
         return
 
@@ -77,35 +80,8 @@ def feature_overview(db):
 
         str_coll_types, set_coll_types = agf.select_college_types(st_key = "num_colleges_applied")
 
-        filtered = (
-            db.apps
-            .loc[
-                db.apps["college_type"].isin(set_coll_types)
-            ]
-            .pivot_table(index = "respondent_code", values = "num_apps", aggfunc = "sum")
-            .reset_index(drop = False)
-        )
-
-        total_students = filtered["respondent_code"].drop_duplicates().shape[0]
-
-        median_colls = int(filtered["num_apps"].median())
-
-        aggregated = (
-            filtered
-            .pivot_table(index = "num_apps", values = "respondent_code", aggfunc = "count")
-            .reset_index(drop = False)
-            .rename(columns = {"respondent_code": "num_students"})
-        )
-
-        aggregated["perc"] = (
-            aggregated["num_students"]
-            / total_students
-            * 100
-        ).round(2)
-
-        aggregated["perc_str"] = agf.make_perc_col(aggregated["perc"])
-
-        aggregated["is_median"] = aggregated["num_apps"].eq(median_colls).apply(lambda x: "Yes" if x else "No")
+        # The median and the number of students with each number of colleges are computed when the data is loaded.
+        median_colls, aggregated = db.overview.num_colleges_chart(set_coll_types)
 
         st.metric(
             "Median Number of Colleges Applied To",
@@ -114,44 +90,47 @@ def feature_overview(db):
 
         st.caption("The orange bar indicates the median.")
 
-        base = (
-            alt.Chart(aggregated)
-        )
-        bar = (
-            base
-            .mark_bar()
-            .encode(
-                x = alt.Y("num_apps:O", title = "Number of Colleges"),
-                y = alt.X("num_students:Q", title = "Number of Students"),
-                color = alt.Color(
-                    "is_median:N",
-                    legend = None,
-                    scale = alt.Scale(
-                        domain = ["No", "Yes"],
-                        range = ["#2986cc", "#ce7e00"] # blue, orange
-                    )
-                ),
-                tooltip = [
-                    alt.Tooltip("num_students:Q", title = "Number of Students"),
-                ]
+        def make_chart(aggregated):
+            base = (
+                alt.Chart(aggregated)
             )
-        )
-        text = (
-            bar.mark_text(
-                align = "center",
-                baseline = "middle",
-                dy = -4,
-            ).encode(
-                text = "perc_str:N"
+            bar = (
+                base
+                .mark_bar()
+                .encode(
+                    x = alt.Y("num_apps:O", title = "Number of Colleges"),
+                    y = alt.X("num_students:Q", title = "Number of Students"),
+                    color = alt.Color(
+                        "is_median:N",
+                        legend = None,
+                        scale = alt.Scale(
+                            domain = ["No", "Yes"],
+                            range = ["#2986cc", "#ce7e00"] # blue, orange
+                        )
+                    ),
+                    tooltip = [
+                        alt.Tooltip("num_students:Q", title = "Number of Students"),
+                    ]
+                )
             )
-        )
-        # rotate x labels so they are horizontal, not vertical
-        chart = (
-            (bar + text)
-            .configure_axisX(labelAngle = 0, labelFontSize = 20)
-        )
+            text = (
+                bar.mark_text(
+                    align = "center",
+                    baseline = "middle",
+                    dy = -4,
+                ).encode(
+                    text = "perc_str:N"
+                )
+            )
+            # rotate x labels so they are horizontal, not vertical
+            chart = (
+                (bar + text)
+                .configure_axisX(labelAngle = 0, labelFontSize = 20)
+            )
+
+            return chart
 
-        st.altair_chart(chart, use_container_width = True)
+        agf.show_chart(make_chart, aggregated)
 
         return
 
@@ -182,102 +161,12 @@ The average number of colleges applied to by each respondent for the local, and
         # Ask for college types
         str_coll_types, set_coll_types = agf.select_college_types(st_key = f"chart_checkbox {st_key}")
 
-        # Transform data
-        apps_filtered = (
-            db.apps
-            .loc[
-                db.apps["college_type"].isin(set_coll_types)
-            ]
-            .pivot_table(index = "respondent_code", values = "num_apps", aggfunc = "sum")
-            .reset_index(drop = False)
-        )
-
-        main_filtered = (
-            db.main
-            .loc[
-                db.main["college_type"].isin(set_coll_types)
-            ]
-        )
-
-        reference_df = db.ddict.loc[
-            db.ddict["info_type"] == info_type,
-            ["var_name", "long_name", "is_other", "college_type"]
-        ]
-
-        if info_type == "location":
-            reference_df = reference_df.loc[
-                reference_df["college_type"].isin(set_coll_types)
-            ]
-
-        bool_cols = reference_df["var_name"].tolist()
-
-        selection = ["index", "respondent_code"] + bool_cols
-
-        main_filtered = main_filtered.loc[:, selection]
-        
-        raw_scores = (
-            main_filtered
-            .pivot_table(
-                index = ["respondent_code"],
-                values = bool_cols,
-                aggfunc = "sum",
-            )
-            .reset_index(drop = False)
-        )
-
-        raw_scores = (
-            raw_scores
-            .merge(
-                right = apps_filtered[["respondent_code", "num_apps"]],
-                on = "respondent_code",
-                how = "left",
-            )
-        )
-
-        for var_name in bool_cols:
-            raw_scores[var_name] = raw_scores[var_name] / raw_scores["num_apps"]
-
-        scored_series = (
-            raw_scores
-            .loc[:, bool_cols]
-            .mean(axis = 0)
-            .mul(100)
-            .round(2)
-        )
-
-        scored_series.name = "perc"
-
-        scored_df = (
-            scored_series
-            .reset_index(drop = False)
-            .rename(columns = {"index": "var_name"})
-            .merge(
-                right = reference_df,
-                on = "var_name",
-                how = "left",
-            )
-        )
-
-        # option_type column depends on the info_type.
-        # for locations, they are grouped into local and international
-        # for interests and characteristics, they are grouped into other options and given options
-        if info_type == "location":
-            scored_df["option_type"] = scored_df["college_type"].apply(
-                lambda x: x.title()
-            )
-        else:
-            scored_df["option_type"] = scored_df["is_other"].apply(
-                lambda x: "Other Option" if x else "Given Option"
-            )
-
-        scored_df["perc_str"] = agf.make_perc_col(scored_df["perc"])
+        # The chart data is computed when the data is loaded, for every info_type and set of college types.
+        scored_df = db.overview.checkbox_chart(info_type, set_coll_types)
 
         # Show intermediary steps
         if debug:
-            st.write(apps_filtered)
-            st.write(main_filtered)
-            st.write(raw_scores)
-            st.write(scored_series)
+            st.write(db.overview.share_matrix(info_type, set_coll_types))
             st.write(scored_df)
 
         # Find top scoring option
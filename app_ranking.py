@@ -0,0 +1,191 @@
+import pandas as pd
+import numpy as np
+
+from app_cache import LRUCache
+
+# Number of rankings that are kept before evicting the least recently used one
+RANKING_CACHE_SIZE = 256
+
+class RankingEngine:
+    """Rank colleges for the Filter and Rank Colleges page without reshaping db.main.
+
+    Per-college option counts are precomputed once from the IndicatorStore of db.main, as a dense matrix of colleges by options. Each college has exactly one location and one college type, so these are stored as integer codes per college. A ranking request then only selects rows and columns of the matrix and does vectorized arithmetic on them.
+
+    Rankings are kept in an LRUCache, keyed by a canonical form of the selection and the number of colleges shown, so that a selection that was already ranked for any user is not ranked again."""
+
+    def __init__(self, main, indicators, ddict, cache_size = RANKING_CACHE_SIZE):
+        checkbox_info_types = ["interests", "characteristics"]
+        option_vars = ddict.loc[
+            ddict["info_type"].isin(checkbox_info_types),
+            "var_name",
+        ].tolist()
+
+        # One row per college, in the same order as pivot_table(index = ["name", "location"])
+        # The keys are grouped as plain strings, because grouping by several categoricals makes every combination of categories, or with observed = True, does not sort them.
+        grouped = main.groupby(
+            [main["name"].astype(object), main["location"].astype(object)],
+            sort = True,
+        )
+
+        college_df = grouped.size().reset_index(name = "num_students")
+        college_df["college_type"] = grouped["college_type"].first().to_numpy()
+
+        self.names = college_df["name"].to_numpy()
+        self.locations = college_df["location"].to_numpy()
+        self.num_students = college_df["num_students"].to_numpy()
+
+        self.option_vars = option_vars
+        self.option_positions = {var_name: j for j, var_name in enumerate(option_vars)}
+
+        # Number of applicants to each college who chose each option
+        # Rows without a name or location are in no group, and get the code len(college_df), which group_sums() skips.
+        college_codes = grouped.ngroup().fillna(len(college_df)).to_numpy(dtype = np.int64)
+        self.counts = np.ascontiguousarray(
+            indicators.group_sums(college_codes, len(college_df), option_vars).T,
+            dtype = np.int64,
+        )
+
+        # Location and college type codes. Locations that are not in the data dictionary get code -1.
+        location_df = ddict.loc[ddict["info_type"] == "location", ["var_name", "long_name"]]
+        self.location_vars = location_df["var_name"].tolist()
+        self.location_codes = pd.Categorical(
+            self.locations,
+            categories = location_df["long_name"].drop_duplicates(),
+        ).codes
+
+        # Several location variables may share a long name, so map each variable to the code of its long name.
+        long_name_codes = {long_name: code for code, long_name in enumerate(location_df["long_name"].drop_duplicates())}
+        self.location_var_codes = {
+            var_name: long_name_codes[long_name]
+            for var_name, long_name in zip(location_df["var_name"], location_df["long_name"])
+        }
+
+        self.college_types = college_df["college_type"].to_numpy()
+
+        self.cache = LRUCache(maxsize = cache_size)
+
+    def college_mask(self, location_vars, college_types = None):
+        """Boolean mask of colleges in any of the given locations, and optionally of the given college types."""
+
+        selected_codes = np.zeros(len(self.location_vars) + 1, dtype = bool)
+        for var_name in location_vars:
+            selected_codes[self.location_var_codes[var_name]] = True
+
+        # Code -1 selects the last item, which is always False.
+        mask = selected_codes[self.location_codes]
+
+        if college_types is not None:
+            mask &= pd.Series(self.college_types).isin(college_types).to_numpy()
+
+        return mask
+
+    def location_key(self, location_vars):
+        """Sorted codes of the selected locations. Variables that share a long name give the same key, whatever order they were selected in."""
+
+        return tuple(sorted(set(self.location_var_codes[var_name] for var_name in location_vars)))
+
+    def top_order(self, values, top_n):
+        """Positions of the top_n largest values, largest first. Ties keep their original order, as in a full stable sort.
+
+        Only the values that may be in the top_n are sorted: everything at least as large as the top_n-th largest value, which np.partition() finds without sorting."""
+
+        if top_n is None or top_n >= len(values):
+            return np.argsort(-values, kind = "stable")
+
+        threshold = np.partition(values, len(values) - top_n)[len(values) - top_n]
+        candidates = np.flatnonzero(values >= threshold)
+
+        order = candidates[np.argsort(-values[candidates], kind = "stable")]
+
+        return order[:top_n]
+
+    def rank_by_num_students(self, location_vars, college_types, top_n = None):
+        """Rank colleges by number of applicants. Dense ranks are used, so tied colleges share a rank and ranks increase by 1 between groups.
+
+        Returns the total number of ranked colleges and a DataFrame of the top_n colleges."""
+
+        key = ("num_students", self.location_key(location_vars), tuple(sorted(college_types)), top_n)
+
+        result = self.cache.get(key)
+        if result is None:
+            result = self.compute_rank_by_num_students(location_vars, college_types, top_n)
+            self.cache.put(key, result)
+
+        return result
+
+    def compute_rank_by_num_students(self, location_vars, college_types, top_n = None):
+        """Rank the top_n colleges in the selection by number of applicants, without using the cache."""
+
+        positions = np.flatnonzero(self.college_mask(location_vars, college_types))
+
+        num_students = self.num_students[positions]
+
+        order = self.top_order(num_students, top_n)
+
+        # Dense rank: 1 + the number of distinct values greater than this one
+        # Every value greater than a shown one is also shown, so the distinct values of the shown colleges are enough.
+        distinct_desc = np.unique(num_students[order])[::-1]
+        ranks = np.searchsorted(-distinct_desc, -num_students[order], side = "left") + 1
+
+        rank_df = pd.DataFrame({
+            "name": self.names[positions[order]],
+            "location": self.locations[positions[order]],
+            "num_students": num_students[order],
+            "rank": ranks.astype("int64"),
+        })
+
+        return len(positions), rank_df
+
+    def rank_by_options(self, location_vars, option_vars, top_n = None):
+        """Rank colleges by the product of min-max scaled counts of the selected options.
+
+        Each count is scaled to 0-1 among the colleges in the selected locations, then 0.01 is added to avoid zeros. An option that every college has the same count for does not affect the score.
+
+        The options are sorted before scoring, so the same options selected in a different order give exactly the same scores.
+
+        Returns the total number of ranked colleges and a DataFrame of the top_n colleges, with their option counts and final scores."""
+
+        key = ("options", self.location_key(location_vars), tuple(sorted(set(option_vars))), top_n)
+
+        result = self.cache.get(key)
+        if result is None:
+            result = self.compute_rank_by_options(location_vars, list(key[2]), top_n)
+            self.cache.put(key, result)
+
+        return result
+
+    def compute_rank_by_options(self, location_vars, option_vars, top_n = None):
+        """Rank the top_n colleges in the selected locations by the selected options, without using the cache."""
+
+        positions = np.flatnonzero(self.college_mask(location_vars))
+        columns = [self.option_positions[var_name] for var_name in option_vars]
+
+        counts = self.counts[np.ix_(positions, columns)]
+
+        if len(positions) == 0:
+            return 0, pd.DataFrame(columns = ["name", "location"] + list(option_vars) + ["final_score"])
+
+        min_values = counts.min(axis = 0)
+        ranges = counts.max(axis = 0) - min_values
+
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            scores = (counts - min_values) / ranges + 0.01
+
+        # A range of 0 gives NaN scores, which are skipped in the product.
+        scores[:, ranges == 0] = 1.0
+        final_scores = scores.prod(axis = 1)
+
+        order = self.top_order(final_scores, top_n)
+
+        # Build the DataFrame in one step, since adding columns one at a time is slower than the ranking itself.
+        rank_columns = {
+            "name": self.names[positions[order]],
+            "location": self.locations[positions[order]],
+        }
+        for j, var_name in enumerate(option_vars):
+            rank_columns[var_name] = counts[order, j]
+        rank_columns["final_score"] = final_scores[order]
+
+        rank_df = pd.DataFrame(rank_columns)
+
+        return len(positions), rank_df
@@ -0,0 +1,167 @@
+import time
+import threading
+
+import app_data as ad
+
+# Seconds between checks of the data source for changes
+DEFAULT_REFRESH_SECONDS = 300
+
+class DataRefresher:
+    """Keep the app's data up to date with its data source, in a background thread.
+
+    Every refresh_seconds, the thread reads a cheap revision signal from the source: the number of rows of each sheet, and for local files, their modification times. If only the main sheet grew, only its new rows are fetched and added with ad.append_rows(). If anything else changed, including the main sheet shrinking, everything is loaded again.
+
+    Survey responses are only ever added at the end of the main sheet, but rows may still be edited or deleted by hand. So before new rows are appended, the last row that was already loaded is fetched again and compared with ad.row_signature(); if it changed, for example because a row was deleted and another one added, everything is loaded again. Google Sheets and SQLite give no modification time, so this check is also done when the number of rows did not change. Edits to earlier rows that keep the number of rows are only seen by sources with modification times.
+
+    With a shared_snapshot, each process checks the source, but only the first one to see a change rebuilds the shared snapshot; the others map the new file. New rows are not added in place in this mode, since the snapshot is shared.
+
+    The new db is built next to the current one and then swapped in with one assignment, so sessions always read a complete db. Sessions should read refresher.db once per rerun."""
+
+    def __init__(self, secrets):
+        config = secrets.get("data_source", {})
+
+        self.refresh_seconds = config.get("refresh_seconds", DEFAULT_REFRESH_SECONDS)
+        self.analytics_path = config.get("analytics_snapshot")
+        self.shared_path = config.get("shared_snapshot")
+        self.source = None if self.analytics_path else ad.get_source(secrets)
+
+        self.revision = None
+        self.num_main_rows = 0
+        self.last_row_signature = None
+        self.db = self.load()
+
+        # Outcome of the last refresh, to show when debugging
+        self.last_refresh = {"status": "loaded", "at": time.strftime("%Y-%m-%d %H:%M:%S"), "error": None}
+
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def current_revision(self):
+        """Revision signal of the data source."""
+
+        if self.analytics_path:
+            return ad.read_snapshot_manifest(self.analytics_path)["data_version"]
+
+        return self.source.revision()
+
+    def load(self):
+        """Load everything from the data source."""
+
+        # The revision is read first, so a change made during the load is seen by the next refresh.
+        # It is only kept once the load succeeds, so a failed load is tried again.
+        revision = self.current_revision()
+
+        # Snapshots do not keep the rows of the main sheet as they were read, so they have no last row signature.
+        last_row_signature = None
+
+        if self.analytics_path:
+            db = ad.load_db_snapshot(self.analytics_path)
+            num_main_rows = len(db.main)
+        elif self.shared_path:
+            db = ad.load_shared_db(self.source, self.shared_path, revision = revision)
+            num_main_rows = len(db.main)
+        else:
+            sheets = self.source.load_sheets()
+            num_main_rows = len(sheets["main"])
+            if num_main_rows > 0:
+                last_row_signature = ad.row_signature(sheets["main"], -1)
+            db = ad.add_indexes(ad.build_db(sheets))
+
+        self.revision = revision
+        self.num_main_rows = num_main_rows
+        self.last_row_signature = last_row_signature
+
+        return db
+
+    def can_append(self, revision):
+        """Whether the change from the loaded revision is only new rows at the end of the main sheet."""
+
+        if self.last_row_signature is None or revision.keys() != self.revision.keys():
+            return False
+
+        for sheet_name, (num_rows, modified) in revision.items():
+            old_num_rows, old_modified = self.revision[sheet_name]
+
+            if sheet_name == "main":
+                if num_rows <= self.num_main_rows:
+                    return False
+            elif num_rows != old_num_rows or modified != old_modified:
+                return False
+
+        return True
+
+    def load_from_last_row(self):
+        """Rows of the main sheet from the last one that was already loaded, and whether that row is unchanged."""
+
+        rows = self.source.load_new_rows("main", self.num_main_rows - 1)
+        unchanged = len(rows) > 0 and ad.row_signature(rows, 0) == self.last_row_signature
+
+        return rows, unchanged
+
+    def refresh(self):
+        """Check the data source once, and update db if it changed. Returns what was done."""
+
+        revision = self.current_revision()
+
+        if revision == self.revision:
+            # Without a modification time, an edited last row is only seen by reading it again.
+            if self.last_row_signature is None or revision["main"][1] is not None:
+                return "unchanged"
+
+            rows, unchanged = self.load_from_last_row()
+            if unchanged:
+                return "unchanged"
+
+        elif self.can_append(revision):
+            rows, unchanged = self.load_from_last_row()
+
+            # If the last loaded row changed, the new rows may not start where the loaded ones end.
+            if unchanged:
+                new_rows = rows.iloc[1:].reset_index(drop = True)
+
+                self.db = ad.append_rows(self.db, new_rows)
+                self.num_main_rows += len(new_rows)
+                self.last_row_signature = ad.row_signature(rows, -1)
+                self.revision = revision
+
+                return "appended"
+
+        self.db = self.load()
+
+        return "reloaded"
+
+    def run(self):
+        """Refresh every refresh_seconds until stopped. If a refresh fails, the current db is kept and the next one tries again."""
+
+        while not self.stop_event.wait(self.refresh_seconds):
+            try:
+                status = self.refresh()
+                error = None
+            except Exception as exception:
+                status = "failed"
+                error = repr(exception)
+
+            self.last_refresh = {"status": status, "at": time.strftime("%Y-%m-%d %H:%M:%S"), "error": error}
+
+        return None
+
+    def start(self):
+        """Start the background thread, unless refresh_seconds is 0."""
+
+        if self.refresh_seconds and self.thread is None:
+            # A daemon thread does not keep the process alive when Streamlit exits.
+            self.thread = threading.Thread(target = self.run, name = "data-refresher", daemon = True)
+            self.thread.start()
+
+        return self
+
+    def stop(self):
+        """Stop the background thread after its current refresh."""
+
+        self.stop_event.set()
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+        return None
@@ -0,0 +1,957 @@
+# Benchmarks for the app's data preparation and page computations, using synthetic data.
+# The original pandas versions of the computations are kept here so that the faster versions can be checked against them.
+
+#%%
+import os
+import time
+import tempfile
+import warnings
+import tracemalloc
+
+import pandas as pd
+import numpy as np
+
+import app_data as ad
+import app_general_functions as agf
+from app_ranking import RankingEngine
+from app_aggregates import OverviewStore, COLLEGE_TYPE_SETS, option_shares
+from app_college_index import CollegeIndex
+from app_indicators import IndicatorStore
+
+def time_function(func, *args, repeat = 1, **kwargs):
+    """Run a function and return its result and its average wall time in seconds."""
+
+    start = time.perf_counter()
+    for i in range(repeat):
+        result = func(*args, **kwargs)
+    seconds = (time.perf_counter() - start) / repeat
+
+    return result, seconds
+
+def make_sheets(num_colleges, num_options, num_rows, num_locations = 8, seed = 0):
+    """Make synthetic `main`, `colleges` and `ddict` sheets with the same layout as the real ones."""
+
+    rng = np.random.default_rng(seed)
+
+    college_types = ["local", "international"]
+
+    ddict_rows = [
+        ["index", "index", "id", np.nan, False, True, "int64"],
+        ["name", "name", "id", np.nan, False, True, "str"],
+        ["respondent_code", "respondent_code", "id", np.nan, False, True, "str"],
+    ]
+
+    location_names = []
+    for i in range(num_locations):
+        college_type = college_types[i % 2]
+        location_names.append([f"Location {i}", college_type])
+        ddict_rows.append([f"loc_{i}", f"Location {i}", "location", college_type, False, False, "bool"])
+
+    option_vars = []
+    for i in range(num_options):
+        info_type = "interests" if i % 4 == 0 else "characteristics"
+        var_name = f"{info_type[:4]}_{i}"
+        option_vars.append(var_name)
+        ddict_rows.append([var_name, f"Option {i}", info_type, np.nan, i % 10 == 9, True, "bool"])
+
+    ddict = pd.DataFrame(
+        ddict_rows,
+        columns = ["var_name", "long_name", "info_type", "college_type", "is_other", "initially_present", "primitive_type"],
+    )
+
+    college_locations = rng.integers(0, num_locations, num_colleges)
+    colleges = pd.DataFrame({
+        "name": [f"College {i:05d}" for i in range(num_colleges)],
+        "location": [location_names[j][0] for j in college_locations],
+        "college_type": [location_names[j][1] for j in college_locations],
+    })
+
+    # A few colleges get most of the applications.
+    popularity = rng.pareto(1.5, num_colleges) + 0.1
+    college_choices = rng.choice(num_colleges, size = num_rows, p = popularity / popularity.sum())
+
+    main = pd.DataFrame({
+        "index": np.arange(num_rows),
+        "name": colleges["name"].to_numpy()[college_choices],
+        "respondent_code": [f"R{i:06d}" for i in rng.integers(0, max(1, num_rows // 3), num_rows)],
+    })
+
+    # Each option has its own popularity.
+    option_probs = rng.uniform(0.01, 0.5, num_options)
+    option_values = rng.random((num_rows, num_options)) < option_probs
+    main = pd.concat([main, pd.DataFrame(option_values, columns = option_vars)], axis = 1)
+
+    sheets = {
+        "main": main,
+        "colleges": colleges,
+        "ddict": ddict,
+    }
+
+    return sheets
+
+#%%
+# Ranking colleges
+
+def rank_by_options_pandas(main, selected_locations, selected_columns):
+    """Original filtered ranking from app_filter_rank.py, with a stable sort so that ties are comparable."""
+
+    location_mask = main.loc[:, selected_locations].any(axis = 1)
+    rank_df = main.loc[location_mask, ["index", "respondent_code", "name", "location", "college_type"] + selected_columns]
+
+    rank_df = (
+        rank_df
+        .pivot_table(
+            index = ["name", "location"],
+            values = selected_columns,
+            aggfunc = "sum",
+        )
+        .reset_index(drop = False)
+    )
+
+    score_cols = []
+    for col in selected_columns:
+        min_value = rank_df[col].min()
+        max_value = rank_df[col].max()
+        rng = (max_value - min_value)
+
+        score_col_name = f"{col}_score"
+        score_cols.append(score_col_name)
+
+        rank_df[score_col_name] = rank_df[col].sub(min_value).div(rng).add(0.01)
+
+    rank_df["final_score"] = rank_df[score_cols].product(axis = 1)
+
+    rank_df = (
+        rank_df.sort_values("final_score", ascending = False, kind = "stable")
+        .reset_index(drop = True)
+    )
+
+    return rank_df
+
+def rank_by_num_students_pandas(main, selected_locations, set_college_types):
+    """Original unfiltered ranking from app_filter_rank.py, with a stable sort so that ties are comparable."""
+
+    location_mask = main.loc[:, selected_locations].any(axis = 1)
+    rank_df = main.loc[location_mask, ["index", "respondent_code", "name", "location", "college_type"]]
+
+    rank_df = rank_df.loc[rank_df["college_type"].isin(set_college_types)].copy()
+    rank_df["num_students"] = 1
+
+    rank_df = (
+        rank_df.pivot_table(
+            index = ["name", "location"],
+            values = "num_students",
+            aggfunc = "sum",
+        )
+        .reset_index(drop = False)
+    )
+
+    rank_df["rank"] = (
+        rank_df["num_students"]
+        .rank(method = "dense", ascending = False)
+        .astype("int64")
+    )
+
+    rank_df = (
+        rank_df
+        .sort_values("rank", ascending = True, kind = "stable")
+        .reset_index(drop = True)
+    )
+
+    return rank_df
+
+def bench_ranking(num_colleges = 10_000, num_options = 200, num_rows = 200_000, num_selected = 5, top_n = 20, num_requests = 20, seed = 0):
+    """Check the ranking engine against the original pandas code on random selections, and time both.
+
+    The engine is timed without its cache (every request computed) and with it (every request already cached)."""
+
+    sheets = make_sheets(num_colleges, num_options, num_rows)
+    db = ad.add_indexes(ad.build_db(sheets))
+
+    # The original code ran on db.main before its dtypes were compacted.
+    original_main = ad.build_db(sheets, compact = False).main
+
+    rng = np.random.default_rng(seed)
+
+    location_vars = db.ddict.loc[db.ddict["info_type"] == "location", "var_name"].tolist()
+    option_vars = db.ranking.option_vars
+
+    pandas_seconds = 0
+    engine_seconds = 0
+    cached_seconds = 0
+    all_same = True
+
+    for i in range(num_requests):
+        selected_locations = list(rng.choice(location_vars, size = rng.integers(1, len(location_vars) + 1), replace = False))
+        selected_columns = list(rng.choice(option_vars, size = num_selected, replace = False))
+
+        # The engine scores options in sorted order, so the pandas version is given the same order to get identical products.
+        slow_df, seconds = time_function(rank_by_options_pandas, original_main, selected_locations, sorted(selected_columns))
+        pandas_seconds += seconds
+
+        (total, fast_df), seconds = time_function(db.ranking.compute_rank_by_options, selected_locations, sorted(selected_columns), top_n, repeat = 10)
+        engine_seconds += seconds
+
+        # The first call fills the cache. A shuffled selection has the same key.
+        db.ranking.rank_by_options(selected_locations, selected_columns, top_n = top_n)
+        (total, fast_df), seconds = time_function(db.ranking.rank_by_options, selected_locations[::-1], selected_columns[::-1], top_n = top_n, repeat = 10)
+        cached_seconds += seconds
+
+        all_same = (
+            all_same
+            and total == slow_df.shape[0]
+            and fast_df["name"].tolist() == slow_df["name"].head(top_n).tolist()
+            and np.array_equal(fast_df["final_score"].to_numpy(), slow_df["final_score"].head(top_n).to_numpy())
+        )
+
+        slow_df = rank_by_num_students_pandas(original_main, selected_locations, {"local", "international"})
+        total, fast_df = db.ranking.rank_by_num_students(selected_locations, {"local", "international"}, top_n = top_n)
+
+        all_same = (
+            all_same
+            and total == slow_df.shape[0]
+            and fast_df[["name", "num_students", "rank"]].equals(slow_df[["name", "num_students", "rank"]].head(top_n))
+        )
+
+    print(f"{num_colleges} colleges x {len(option_vars)} options, {num_requests} random selections. Same rankings: {all_same}")
+
+    result_df = pd.DataFrame(
+        [
+            ["pandas pivot_table", pandas_seconds / num_requests * 1000],
+            ["ranking engine", engine_seconds / num_requests * 1000],
+            ["ranking engine, cached", cached_seconds / num_requests * 1000],
+        ],
+        columns = ["method", "milliseconds_per_ranking"],
+    )
+
+    return result_df
+
+def bench_ranking_burst(num_users = 40, num_requests_per_user = 25, num_popular = 30, cache_size = 64, seed = 0):
+    """Simulate a class of users who mostly request the same few selections, and report the ranking cache statistics."""
+
+    sheets = make_sheets(2_000, 100, 40_000)
+    db = ad.build_db(sheets)
+    engine = RankingEngine(db.main, ad.load_indicators(db), db.ddict, cache_size = cache_size)
+
+    rng = np.random.default_rng(seed)
+
+    location_vars = db.ddict.loc[db.ddict["info_type"] == "location", "var_name"].tolist()
+
+    popular = [
+        (
+            list(rng.choice(location_vars, size = rng.integers(1, len(location_vars) + 1), replace = False)),
+            list(rng.choice(engine.option_vars, size = rng.integers(1, 4), replace = False)),
+        )
+        for i in range(num_popular)
+    ]
+
+    start = time.perf_counter()
+
+    for i in range(num_users * num_requests_per_user):
+        # Most requests repeat a popular selection, in any order. The rest are new.
+        if rng.random() < 0.9:
+            selected_locations, selected_columns = popular[rng.integers(0, num_popular)]
+            selected_columns = list(rng.permutation(selected_columns))
+        else:
+            selected_locations = list(rng.choice(location_vars, size = 2, replace = False))
+            selected_columns = list(rng.choice(engine.option_vars, size = 3, replace = False))
+
+        engine.rank_by_options(selected_locations, selected_columns, top_n = 20)
+
+    seconds = time.perf_counter() - start
+
+    stats = engine.cache.stats()
+    stats["milliseconds_per_request"] = seconds / (num_users * num_requests_per_user) * 1000
+
+    return pd.Series(stats)
+
+#%%
+# Overview charts
+
+def checkbox_chart_pandas(db, info_type, set_coll_types):
+    """Original chart data of chart_checkbox() in app_overview.py."""
+
+    apps_filtered = (
+        db.apps
+        .loc[
+            db.apps["college_type"].isin(set_coll_types)
+        ]
+        .pivot_table(index = "respondent_code", values = "num_apps", aggfunc = "sum")
+        .reset_index(drop = False)
+    )
+
+    main_filtered = (
+        db.main
+        .loc[
+            db.main["college_type"].isin(set_coll_types)
+        ]
+    )
+
+    reference_df = db.ddict.loc[
+        db.ddict["info_type"] == info_type,
+        ["var_name", "long_name", "is_other", "college_type"]
+    ]
+
+    if info_type == "location":
+        reference_df = reference_df.loc[
+            reference_df["college_type"].isin(set_coll_types)
+        ]
+
+    bool_cols = reference_df["var_name"].tolist()
+
+    selection = ["index", "respondent_code"] + bool_cols
+
+    main_filtered = main_filtered.loc[:, selection]
+
+    raw_scores = (
+        main_filtered
+        .pivot_table(
+            index = ["respondent_code"],
+            values = bool_cols,
+            aggfunc = "sum",
+        )
+        .reset_index(drop = False)
+    )
+
+    raw_scores = (
+        raw_scores
+        .merge(
+            right = apps_filtered[["respondent_code", "num_apps"]],
+            on = "respondent_code",
+            how = "left",
+        )
+    )
+
+    for var_name in bool_cols:
+        raw_scores[var_name] = raw_scores[var_name] / raw_scores["num_apps"]
+
+    scored_series = (
+        raw_scores
+        .loc[:, bool_cols]
+        .mean(axis = 0)
+        .mul(100)
+        .round(2)
+    )
+
+    scored_series.name = "perc"
+
+    scored_df = (
+        scored_series
+        .reset_index(drop = False)
+        .rename(columns = {"index": "var_name"})
+        .merge(
+            right = reference_df,
+            on = "var_name",
+            how = "left",
+        )
+    )
+
+    return scored_df
+
+def num_colleges_chart_pandas(db, set_coll_types):
+    """Original chart data of chart_num_colleges() in app_overview.py."""
+
+    filtered = (
+        db.apps
+        .loc[
+            db.apps["college_type"].isin(set_coll_types)
+        ]
+        .pivot_table(index = "respondent_code", values = "num_apps", aggfunc = "sum")
+        .reset_index(drop = False)
+    )
+
+    median_colls = int(filtered["num_apps"].median())
+
+    aggregated = (
+        filtered
+        .pivot_table(index = "num_apps", values = "respondent_code", aggfunc = "count")
+        .reset_index(drop = False)
+        .rename(columns = {"respondent_code": "num_students"})
+    )
+
+    return median_colls, aggregated
+
+def option_shares_pandas(option_df, respondent_codes):
+    """The share computation of chart_checkbox(), with pivot_table(), merge() and a loop over columns."""
+
+    bool_cols = option_df.columns.tolist()
+
+    main_filtered = option_df.copy()
+    main_filtered["respondent_code"] = respondent_codes
+
+    apps_filtered = (
+        main_filtered
+        .groupby("respondent_code")
+        .size()
+        .rename("num_apps")
+        .reset_index(drop = False)
+    )
+
+    raw_scores = (
+        main_filtered
+        .pivot_table(
+            index = ["respondent_code"],
+            values = bool_cols,
+            aggfunc = "sum",
+        )
+        .reset_index(drop = False)
+        .merge(
+            right = apps_filtered,
+            on = "respondent_code",
+            how = "left",
+        )
+    )
+
+    for var_name in bool_cols:
+        raw_scores[var_name] = raw_scores[var_name] / raw_scores["num_apps"]
+
+    return raw_scores.loc[:, bool_cols].mean(axis = 0).to_numpy()
+
+def bench_option_shares(sizes = ((200_000, 200), (1_000_000, 200)), max_pandas_rows = 200_000, seed = 0):
+    """Check option_shares() against pandas and time both, with the options as a dense boolean matrix and as an IndicatorStore. The pandas version is only run on the smaller sizes."""
+
+    rng = np.random.default_rng(seed)
+
+    rows = []
+    for num_rows, num_options in sizes:
+        num_respondents = max(1, num_rows // 3)
+
+        respondent_codes = np.sort(rng.integers(0, num_respondents, num_rows))
+        option_df = pd.DataFrame(
+            rng.random((num_rows, num_options)) < rng.uniform(0.01, 0.5, num_options),
+            columns = [f"opt_{i}" for i in range(num_options)],
+        )
+
+        indicators = IndicatorStore.from_frame(option_df, option_df.columns.tolist())
+
+        # Respondents without applications are left out, as in the pandas version.
+        dense, dense_seconds = time_function(option_shares, option_df.to_numpy(), respondent_codes, num_respondents)
+        sparse, sparse_seconds = time_function(option_shares, indicators, respondent_codes, num_respondents)
+
+        if num_rows <= max_pandas_rows:
+            slow, slow_seconds = time_function(option_shares_pandas, option_df, respondent_codes)
+            same = np.array_equal(dense, slow) and np.array_equal(sparse, slow)
+        else:
+            slow_seconds = np.nan
+            same = np.array_equal(dense, sparse)
+
+        rows.append([num_rows, num_options, slow_seconds * 1000, dense_seconds * 1000, sparse_seconds * 1000, same])
+
+    result_df = pd.DataFrame(
+        rows,
+        columns = ["num_rows", "num_options", "pandas_milliseconds", "dense_milliseconds", "indicator_store_milliseconds", "same_shares"],
+    )
+
+    return result_df
+
+def bench_overview(num_colleges = 2_000, num_options = 200, num_rows = 200_000, seed = 0):
+    """Check the overview store against the original pandas code, both when built at once and when built from two batches of rows, and time the page's work per rerun."""
+
+    sheets = make_sheets(num_colleges, num_options, num_rows, seed = seed)
+    db = ad.build_db(sheets)
+
+    # The original code ran on db.main before its dtypes were compacted.
+    original_db = ad.build_db(sheets, compact = False)
+
+    indicators = ad.load_indicators(db)
+    store, build_seconds = time_function(lambda: OverviewStore(db.ddict).update(db.main, indicators))
+
+    # The same rows, added in two batches
+    half = num_rows // 2
+    batches = [
+        (db.main.iloc[rows], IndicatorStore.from_frame(original_db.main.iloc[rows], indicators.var_names))
+        for rows in [slice(0, half), slice(half, num_rows)]
+    ]
+    store_incremental = OverviewStore(db.ddict).update(*batches[0])
+    store_incremental, update_seconds = time_function(store_incremental.update, *batches[1])
+
+    pandas_seconds = 0
+    store_seconds = 0
+    all_same = True
+
+    for college_types in COLLEGE_TYPE_SETS:
+        for info_type in ["location", "interests", "characteristics"]:
+            slow_df, seconds = time_function(checkbox_chart_pandas, original_db, info_type, set(college_types))
+            pandas_seconds += seconds
+
+            fast_df, seconds = time_function(store.checkbox_chart, info_type, set(college_types))
+            store_seconds += seconds
+
+            for fast in [fast_df, store_incremental.checkbox_chart(info_type, set(college_types))]:
+                all_same = all_same and fast[slow_df.columns].equals(slow_df)
+
+        (slow_median, slow_df), seconds = time_function(num_colleges_chart_pandas, original_db, set(college_types))
+        pandas_seconds += seconds
+
+        (fast_median, fast_df), seconds = time_function(store.num_colleges_chart, set(college_types))
+        store_seconds += seconds
+
+        all_same = (
+            all_same
+            and fast_median == slow_median
+            and np.array_equal(fast_df[["num_apps", "num_students"]].to_numpy(), slow_df[["num_apps", "num_students"]].to_numpy())
+        )
+
+    print(f"{num_rows} rows x {num_options} options. Same chart data: {all_same}")
+
+    result_df = pd.DataFrame(
+        [
+            ["pandas, every rerun", pandas_seconds * 1000],
+            ["overview store lookups, every rerun", store_seconds * 1000],
+            ["overview store, build at load time", build_seconds * 1000],
+            [f"overview store, add {num_rows - half} rows", update_seconds * 1000],
+        ],
+        columns = ["method", "milliseconds"],
+    )
+
+    return result_df
+
+#%%
+# College info charts
+
+def college_lookup_pandas(db, name):
+    """Original lookups of feature_college() in app_college.py."""
+
+    num_applicants = (
+        db.main
+        .loc[db.main["name"] == name, :]
+        .shape[0]
+    )
+
+    total_applicants = db.main.drop_duplicates("respondent_code", keep = "first").shape[0]
+
+    one_college_stats = db.college_stats.loc[
+        db.college_stats["name"] == name,
+    ]
+
+    return num_applicants, total_applicants, one_college_stats
+
+def college_lookup_index(db, name):
+    """Lookups of feature_college() with the per-college index."""
+
+    num_applicants = db.college_index.num_applicants(name)
+    total_applicants = db.college_index.total_respondents
+    one_college_stats = db.college_index.stats_rows(db.college_stats, name)
+
+    return num_applicants, total_applicants, one_college_stats
+
+def bench_college(college_counts = (500, 5_000, 20_000), num_options = 50, rows_per_college = 20, num_lookups = 20, seed = 0):
+    """Check the per-college index against the original lookups, and time both as the number of colleges grows."""
+
+    rng = np.random.default_rng(seed)
+
+    rows = []
+    for num_colleges in college_counts:
+        sheets = make_sheets(num_colleges, num_options, num_colleges * rows_per_college, seed = seed)
+        db = ad.build_db(sheets)
+        original_db = ad.build_db(sheets, compact = False)
+        db["college_index"] = CollegeIndex(db.main, db.college_stats, db.colleges)
+
+        names = rng.choice(db.colleges["name"].to_numpy(), size = num_lookups)
+
+        pandas_seconds = 0
+        index_seconds = 0
+        all_same = True
+
+        for name in names:
+            slow, seconds = time_function(college_lookup_pandas, original_db, name)
+            pandas_seconds += seconds
+
+            fast, seconds = time_function(college_lookup_index, db, name)
+            index_seconds += seconds
+
+            all_same = all_same and slow[0] == fast[0] and slow[1] == fast[1] and slow[2].equals(fast[2])
+
+        rows.append([num_colleges, pandas_seconds / num_lookups * 1000, index_seconds / num_lookups * 1000, all_same])
+
+    result_df = pd.DataFrame(
+        rows,
+        columns = ["num_colleges", "pandas_milliseconds", "index_milliseconds", "same_result"],
+    )
+
+    return result_df
+
+#%%
+# Chart specs
+
+def bench_charts(num_options = 200, repeat = 20, seed = 0):
+    """Time building an Altair chart spec against looking it up in the chart cache."""
+
+    rng = np.random.default_rng(seed)
+
+    df = pd.DataFrame({
+        "var_name": [f"opt_{i}" for i in range(num_options)],
+        "long_name": [f"Option {i}" for i in range(num_options)],
+        "perc": rng.uniform(0, 100, num_options).round(2),
+        "option_type": rng.choice(["Given Option", "Other Option"], num_options),
+    })
+    df["perc_str"] = agf.make_perc_col(df["perc"])
+
+    params = {"num_var_title": "Score", "opt_var_title": "Option"}
+
+    def build():
+        return agf.chart_to_spec(agf.make_chart_of_percentages(df, **params))
+
+    def lookup():
+        return agf.chart_spec(agf.make_chart_of_percentages, df, **params)
+
+    spec, build_seconds = time_function(build, repeat = repeat)
+    lookup()
+    spec, lookup_seconds = time_function(lookup, repeat = repeat)
+
+    result_df = pd.DataFrame(
+        [
+            ["build Altair chart and spec", build_seconds * 1000],
+            ["fingerprint and cache lookup", lookup_seconds * 1000],
+        ],
+        columns = ["method", "milliseconds_per_chart"],
+    )
+
+    return result_df
+
+#%%
+# Percentage strings
+
+def bench_perc(num_values = 500_000, seed = 0):
+    """Check make_perc_col() against add_perc_symbol() and time both, on unrounded numbers and on numbers rounded to two decimals, which repeat."""
+
+    rng = np.random.default_rng(seed)
+
+    rows = []
+    for label, series in [
+        ("unrounded", pd.Series(rng.uniform(-1000, 1000, num_values))),
+        ("rounded to 2 decimals", pd.Series(rng.uniform(0, 100, num_values).round(2))),
+    ]:
+        slow, slow_seconds = time_function(series.apply, agf.add_perc_symbol)
+        fast, fast_seconds = time_function(agf.make_perc_col, series)
+        cat, cat_seconds = time_function(agf.make_perc_col, series, categorical = True)
+
+        same = fast.equals(slow) and cat.astype(object).equals(slow)
+
+        rows.append([label, slow_seconds * 1000, fast_seconds * 1000, cat_seconds * 1000, same])
+
+    result_df = pd.DataFrame(
+        rows,
+        columns = ["values", "apply_milliseconds", "make_perc_col_milliseconds", "categorical_milliseconds", "same_strings"],
+    )
+
+    return result_df
+
+#%%
+# Loading
+
+def prepare_main_pandas(main, colleges, ddict):
+    """Original casting, merging and location pivot of build_db()."""
+
+    main = main.copy()
+
+    for index, row in ddict.iterrows():
+        if row["initially_present"]:
+            main[row["var_name"]] = (
+                main[row["var_name"]]
+                .astype(row["primitive_type"])
+            )
+
+    main = (
+        main
+        .merge(
+            right = colleges,
+            on = "name",
+            how = "left",
+        )
+    )
+
+    unique_locs = ddict.loc[
+        ddict["info_type"] == "location"
+    ]
+
+    for index, row in unique_locs.iterrows():
+        main[row["var_name"]] = main["location"] == row["long_name"]
+
+    return main
+
+def time_and_peak(func, *args):
+    """Run a function and return its result, its wall time in seconds and the peak memory it allocated in megabytes."""
+
+    tracemalloc.start()
+    result, seconds = time_function(func, *args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, seconds, peak / 1e6
+
+def bench_load(num_rows = 1_000_000, num_colleges = 2_000, num_options = 50, location_counts = (8, 64), seed = 0):
+    """Time and peak memory of preparing the main sheet with the original loops and with prepare_main(), as the number of locations grows."""
+
+    rows = []
+    for num_locations in location_counts:
+        sheets = make_sheets(num_colleges, num_options, num_rows, num_locations = num_locations, seed = seed)
+        args = (sheets["main"], sheets["colleges"], sheets["ddict"])
+
+        # The original loop warns that the DataFrame is highly fragmented once there are many locations.
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", pd.errors.PerformanceWarning)
+            slow_df, slow_seconds, slow_peak = time_and_peak(prepare_main_pandas, *args)
+
+        fast_df, fast_seconds, fast_peak = time_and_peak(ad.prepare_main, *args)
+
+        rows.append([
+            num_rows,
+            num_locations,
+            slow_seconds * 1000,
+            fast_seconds * 1000,
+            slow_peak,
+            fast_peak,
+            slow_df._mgr.nblocks,
+            fast_df._mgr.nblocks,
+            slow_df.equals(fast_df),
+        ])
+
+    result_df = pd.DataFrame(
+        rows,
+        columns = ["num_rows", "num_locations", "loop_milliseconds", "batched_milliseconds", "loop_peak_megabytes", "batched_peak_megabytes", "loop_blocks", "batched_blocks", "same_result"],
+    )
+
+    return result_df
+
+def check_load_sqlite(num_rows = 20_000, num_colleges = 200, num_options = 50, seed = 0):
+    """Check prepare_main() against the original loops on sheets read back from a SQLite snapshot, which stores bool columns, including initially_present, as 0 and 1."""
+
+    sheets = make_sheets(num_colleges, num_options, num_rows, seed = seed)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "snapshot.sqlite")
+        ad.save_snapshot(sheets, path)
+        sqlite_sheets = ad.LocalSource(path).load_sheets()
+
+    args = (sqlite_sheets["main"], sqlite_sheets["colleges"], sqlite_sheets["ddict"])
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", pd.errors.PerformanceWarning)
+        slow_df = prepare_main_pandas(*args)
+
+    fast_df = ad.prepare_main(*args)
+
+    result_df = pd.DataFrame(
+        [[
+            sqlite_sheets["ddict"]["initially_present"].dtype,
+            (slow_df.dtypes == bool).sum(),
+            (fast_df.dtypes == bool).sum(),
+            slow_df.equals(fast_df),
+        ]],
+        columns = ["initially_present_dtype", "loop_bool_columns", "batched_bool_columns", "same_result"],
+    )
+
+    return result_df
+
+#%%
+# Memory
+
+def bench_memory(college_counts = (500, 5_000, 20_000), num_options = 200, rows_per_college = 20, seed = 0):
+    """Memory used by db.main with and without compact dtypes, as the number of colleges grows. When compacted, the option and location columns of main are stored in db.indicators, which is counted with it."""
+
+    rows = []
+    for num_colleges in college_counts:
+        sheets = make_sheets(num_colleges, num_options, num_colleges * rows_per_college, seed = seed)
+
+        report_df = ad.memory_report(ad.build_db(sheets), before = ad.build_db(sheets, compact = False))
+
+        megabytes_before = report_df.loc["main", "megabytes_before"]
+        megabytes = report_df.loc["main", "megabytes"] + report_df.loc["indicators", "megabytes"]
+
+        rows.append([num_colleges, num_colleges * rows_per_college, megabytes_before, megabytes, round(megabytes / megabytes_before, 3)])
+
+    result_df = pd.DataFrame(
+        rows,
+        columns = ["num_colleges", "num_rows", "main_megabytes_before", "main_megabytes", "ratio"],
+    )
+
+    return result_df
+
+def bench_indicators(num_rows = 1_000_000, num_options = 50, num_colleges = 2_000, densities = (0.01, 0.05, 0.25, 0.5), seed = 0):
+    """Memory of dense bool columns and of an IndicatorStore, and the time of column sums and per-college sums with each, as the share of True values grows."""
+
+    rng = np.random.default_rng(seed)
+
+    var_names = [f"opt_{i}" for i in range(num_options)]
+    college_codes = rng.integers(0, num_colleges, num_rows)
+
+    rows = []
+    for density in densities:
+        dense_df = pd.DataFrame(rng.random((num_rows, num_options), dtype = np.float32) < density, columns = var_names)
+        indicators = IndicatorStore.from_frame(dense_df, var_names)
+
+        slow_sums, slow_sum_seconds = time_function(lambda: dense_df.sum(axis = 0).to_numpy())
+        fast_sums, fast_sum_seconds = time_function(indicators.column_sums, var_names)
+
+        slow_groups, slow_group_seconds = time_function(lambda: dense_df.groupby(college_codes).sum().to_numpy().T)
+        fast_groups, fast_group_seconds = time_function(indicators.group_sums, college_codes, num_colleges, var_names)
+
+        rows.append([
+            density,
+            dense_df.memory_usage(index = False).sum() / 1e6,
+            indicators.nbytes() / 1e6,
+            slow_sum_seconds * 1000,
+            fast_sum_seconds * 1000,
+            slow_group_seconds * 1000,
+            fast_group_seconds * 1000,
+            np.array_equal(slow_sums, fast_sums) and np.array_equal(slow_groups, fast_groups),
+        ])
+
+    result_df = pd.DataFrame(
+        rows,
+        columns = ["density", "dense_megabytes", "store_megabytes", "dense_sum_milliseconds", "store_sum_milliseconds", "dense_group_milliseconds", "store_group_milliseconds", "same_result"],
+    )
+
+    return result_df
+
+#%%
+# Refresh
+
+def bench_refresh(num_colleges = 2_000, num_options = 200, num_rows = 200_000, new_shares = (0.01, 0.1), seed = 0):
+    """Check that adding new rows with append_rows() gives the same tables as building everything again, and time both."""
+
+    sheets = make_sheets(num_colleges, num_options, num_rows, seed = seed)
+
+    full_db, full_seconds = time_function(lambda: ad.add_indexes(ad.build_db(sheets)))
+
+    rows = []
+    for new_share in new_shares:
+        num_old_rows = int(num_rows * (1 - new_share))
+
+        old_sheets = dict(sheets, main = sheets["main"].iloc[:num_old_rows].reset_index(drop = True))
+        old_db = ad.add_indexes(ad.build_db(old_sheets))
+
+        new_rows = sheets["main"].iloc[num_old_rows:].reset_index(drop = True)
+        db, append_seconds = time_function(ad.append_rows, old_db, new_rows)
+
+        same_tables = all(
+            db[table_name].equals(full_db[table_name])
+            for table_name in ["apps", "college_stats", "college_summary", "option_summary", "indicators"]
+        )
+        same_charts = all(
+            db.overview.checkbox_chart(info_type, college_types).equals(full_db.overview.checkbox_chart(info_type, college_types))
+            for info_type in ["location", "interests", "characteristics"]
+            for college_types in COLLEGE_TYPE_SETS
+        )
+
+        # Categories of main are in a different order, so the values are compared.
+        same_main = db.main.astype(object).equals(full_db.main.astype(object))
+
+        rows.append([num_rows - num_old_rows, full_seconds * 1000, append_seconds * 1000, same_tables and same_charts and same_main])
+
+    result_df = pd.DataFrame(
+        rows,
+        columns = ["new_rows", "full_build_milliseconds", "append_milliseconds", "same_result"],
+    )
+
+    return result_df
+
+#%%
+# Shared snapshot across processes
+
+def process_memory():
+    """Memory of this process in megabytes, from /proc/self/smaps_rollup (Linux only).
+
+    Proportional set sizes split each shared page between the processes that map it, so summing them over processes gives their total memory. pss_anon is memory of this process only, and pss_shmem is its share of the shared snapshot when it is on a tmpfs."""
+
+    memory = {}
+    with open("/proc/self/smaps_rollup") as file:
+        for line in file:
+            fields = line.split()
+            if fields[0] in ("Rss:", "Pss:", "Pss_Anon:", "Pss_Shmem:"):
+                memory[fields[0][:-1].lower()] = int(fields[1]) / 1e3
+
+    return memory
+
+def load_worker(mode, snapshot_path, shared_path, barrier, results):
+    """One app process: load db, wait until every process has loaded, then report its load time and memory."""
+
+    start = time.process_time()
+
+    if mode == "shared":
+        db = ad.load_shared_db(ad.LocalSource(snapshot_path), shared_path)
+    else:
+        db = ad.build_db(ad.LocalSource(snapshot_path).load_sheets())
+        db = ad.add_indexes(db)
+
+    # CPU time, since the processes may share fewer cores than there are processes
+    seconds = time.process_time() - start
+
+    # Memory is measured while every process is alive, so that shared pages are split between them.
+    barrier.wait()
+    results.put(dict(process_memory(), seconds = seconds))
+    barrier.wait()
+
+    return None
+
+def bench_shared(worker_counts = (1, 2, 4), num_colleges = 5_000, num_options = 200, num_rows = 200_000, seed = 0):
+    """Load time per process and total memory of several app processes that each build their own db, or that share one memory-mapped snapshot. The shared snapshot is built once before the processes start, like after the first process built it."""
+
+    import tempfile
+    import multiprocessing
+
+    # Each app process is a separate interpreter, so the workers are spawned rather than forked from this one.
+    context = multiprocessing.get_context("spawn")
+
+    shared_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+    rows = []
+    with tempfile.TemporaryDirectory() as snapshot_path, tempfile.TemporaryDirectory(dir = shared_dir) as shared_temp:
+        ad.save_snapshot(make_sheets(num_colleges, num_options, num_rows, seed = seed), snapshot_path)
+
+        shared_path = os.path.join(shared_temp, "analytics_snapshot.arrow")
+        db, build_seconds = time_function(ad.load_shared_db, ad.LocalSource(snapshot_path), shared_path)
+        snapshot_megabytes = os.path.getsize(shared_path) / 1e6
+
+        for mode in ["own copy", "shared"]:
+            for num_workers in worker_counts:
+                barrier = context.Barrier(num_workers)
+                results = context.Queue()
+
+                workers = [
+                    context.Process(target = load_worker, args = (mode, snapshot_path, shared_path, barrier, results))
+                    for i in range(num_workers)
+                ]
+                for worker in workers:
+                    worker.start()
+
+                worker_results = [results.get() for worker in workers]
+
+                for worker in workers:
+                    worker.join()
+
+                rows.append([
+                    mode,
+                    num_workers,
+                    np.mean([result["seconds"] for result in worker_results]) * 1000,
+                    sum(result["rss"] for result in worker_results),
+                    sum(result["pss"] for result in worker_results),
+                    sum(result["pss_anon"] for result in worker_results),
+                    sum(result["pss_shmem"] for result in worker_results),
+                ])
+
+    print(f"{num_rows} rows. Shared snapshot: {snapshot_megabytes:.1f} MB, built once in {build_seconds:.1f} s")
+
+    result_df = pd.DataFrame(
+        rows,
+        columns = ["mode", "num_processes", "load_cpu_milliseconds_per_process", "total_rss_megabytes", "total_pss_megabytes", "total_pss_anon_megabytes", "total_pss_shmem_megabytes"],
+    )
+
+    return result_df
+
+if __name__ == "__main__":
+    print(bench_ranking().to_string())
+    print(bench_ranking_burst().to_string())
+    print(bench_option_shares().to_string())
+    print(bench_overview().to_string())
+    print(bench_college().to_string())
+    print(bench_charts().to_string())
+    print(bench_perc().to_string())
+    print(bench_load().to_string())
+    print(check_load_sqlite().to_string())
+    print(bench_memory().to_string())
+    print(bench_indicators().to_string())
+    print(bench_refresh().to_string())
+    print(bench_shared().to_string())
+#%%
@@ -0,0 +1,508 @@
+# Benchmarks for the cleaning functions, using synthetic data.
+# The row-by-row versions are the original cleaning loops. They are kept here so that the faster versions can be checked against them.
+
+#%%
+import time
+
+import pandas as pd
+import numpy as np
+import Levenshtein
+
+import clean_general_functions as cgf
+import clean_name_matching as cnm
+
+def time_function(func, *args, **kwargs):
+    """Run a function once and return its result and its wall time in seconds."""
+
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+
+    return result, seconds
+
+#%%
+# Melting the survey
+
+def make_survey(num_respondents, num_local = 5, num_international = 3, seed = 0):
+    """Make a synthetic survey and data dictionary with the same layout as the real ones."""
+
+    rng = np.random.default_rng(seed)
+
+    col_groups = (
+        [f"loc_{i}" for i in range(1, num_local + 1)]
+        + [f"int_{i}" for i in range(1, num_international + 1)]
+    )
+    info_types = ["name", "interests", "characteristics", "location"]
+
+    dict_rows = [["timestamp", np.nan], ["respondent_code", np.nan]]
+    for cg in col_groups:
+        for info_type in info_types:
+            dict_rows.append([f"{cg}_{info_type}", cg])
+
+    data_dict = pd.DataFrame(dict_rows, columns = ["new_col_name", "col_group"])
+
+    survey_df = pd.DataFrame({
+        "timestamp": "2022-01-01",
+        "respondent_code": [f"R{i:06d}" for i in range(num_respondents)],
+    })
+
+    for cg in col_groups:
+        # Most respondents leave most column groups empty.
+        answered = rng.random(num_respondents) < 0.4
+        for info_type in info_types:
+            values = pd.Series(f"{cg} {info_type}", index = survey_df.index)
+            survey_df[f"{cg}_{info_type}"] = values.where(answered)
+
+    return survey_df, data_dict
+
+def melt_survey_rowwise(survey_df, data_dict):
+    """Original melt loop from clean_1_expand.py."""
+
+    col_group_lists = {}
+
+    for cg in data_dict["col_group"].dropna().unique():
+        col_group_lists[cg] = data_dict.loc[
+            data_dict["col_group"] == cg,
+            "new_col_name",
+        ].tolist()
+
+    melted_row_list = []
+
+    for index, melt_row in survey_df.iterrows():
+        res_code = melt_row["respondent_code"]
+        for cg in col_group_lists:
+            col_list = col_group_lists[cg]
+
+            new_row = melt_row[col_list].copy()
+            new_row = new_row.rename({col_name: col_name.split("_")[2] for col_name in col_list})
+            new_row["respondent_code"] = res_code
+            new_row["college_type"] = cgf.COLLEGE_TYPE_DICT[cg.split("_")[0]]
+
+            melted_row_list.append(new_row)
+
+    melted_df = (
+        pd.DataFrame(melted_row_list)
+        .dropna(
+            subset = ["name", "interests", "characteristics", "location"],
+            how = "all",
+        )
+        .reset_index(drop = True)
+    )
+
+    return melted_df
+
+def bench_melt(sizes = (1_000, 10_000, 100_000)):
+    """Compare the row-by-row melt with cgf.melt_survey()."""
+
+    result_rows = []
+
+    for num_respondents in sizes:
+        survey_df, data_dict = make_survey(num_respondents)
+
+        fast_df, fast_seconds = time_function(cgf.melt_survey, survey_df, data_dict)
+        slow_df, slow_seconds = time_function(melt_survey_rowwise, survey_df, data_dict)
+
+        same_output = fast_df.to_csv(index = False) == slow_df.to_csv(index = False)
+
+        result_rows.append([num_respondents, slow_seconds, fast_seconds, slow_seconds / fast_seconds, same_output])
+
+    result_df = pd.DataFrame(
+        result_rows,
+        columns = ["num_respondents", "rowwise_seconds", "vectorized_seconds", "speedup", "same_output"],
+    )
+
+    return result_df
+
+#%%
+# Expanding the sequence-type columns
+
+def make_options():
+    """Make a synthetic options table. Some options contain commas, like the real ones."""
+
+    option_rows = [
+        ["interests", "STEM-oriented, such as science and engineering", "int_stem", "STEM"],
+        ["interests", "ABM-oriented", "int_abm", "ABM"],
+        ["interests", "HUMSS-oriented", "int_humss", "HUMSS"],
+        ["interests", "Arts and Design", "int_ad", "Arts"],
+        ["interests", "Sports", "int_sports", "Sp"],
+        ["characteristics", "Perceived high quality of education", "char_quality", "Perceived h"],
+        ["characteristics", "Popularity", "char_pop", "Pop"],
+        ["characteristics", "Low tuition, fees", "char_tuition", "Low"],
+        ["characteristics", "Perceived employability", "char_employ", "Perceived e"],
+    ]
+
+    option_df = pd.DataFrame(
+        option_rows,
+        columns = ["info_type", "option", "shortcut", "unique_starting_substring"],
+    )
+
+    return option_df
+
+def make_melted(num_rows, option_df, num_distinct = 2_000, seed = 0):
+    """Make a synthetic melted survey with comma-joined checkbox answers.
+
+    Some answers have an "Other" option at the end, and some are cut off in the middle, to exercise the edge cases of the parser."""
+
+    rng = np.random.default_rng(seed)
+
+    melted_df = pd.DataFrame({
+        "name": "College",
+        "location": "National Capital Region",
+        "respondent_code": [f"R{i:06d}" for i in range(num_rows)],
+        "college_type": "local",
+    })
+
+    for seq_col in ["interests", "characteristics"]:
+        options = option_df.loc[option_df["info_type"] == seq_col, "option"].tolist()
+
+        distinct_answers = []
+        for i in range(num_distinct):
+            chosen = [option for option in options if rng.random() < 0.4]
+            if rng.random() < 0.2:
+                chosen.append(f"Other answer {i}")
+            answer = ", ".join(chosen)
+            if rng.random() < 0.1:
+                answer = answer[:rng.integers(0, len(answer) + 1)]
+            distinct_answers.append(answer if len(answer) > 0 else np.nan)
+
+        melted_df[seq_col] = np.array(distinct_answers, dtype = object)[rng.integers(0, num_distinct, num_rows)]
+
+    return melted_df
+
+def expand_rowwise(melted_df, option_df, seq_cols = ("interests", "characteristics")):
+    """Original expansion loop from clean_1_expand.py."""
+
+    expanded_row_list = []
+
+    for melt_index, melt_row in melted_df.iterrows():
+        expanded_row = melt_row[["name", "location", "respondent_code", "college_type"]].copy()
+
+        for seq_col in seq_cols:
+            sub_df = option_df.loc[option_df["info_type"] == seq_col, :]
+
+            seq_text = melt_row[seq_col]
+
+            if not isinstance(seq_text, str):
+                for opt_index, opt_row in sub_df.iterrows():
+                    expanded_row[opt_row["shortcut"]] = False
+                expanded_row[f"{seq_col}_other"] = np.nan
+                continue
+
+            start_index = 0
+            seq_length = len(seq_text)
+
+            for opt_index, opt_row in sub_df.iterrows():
+                option, shortcut, uss = opt_row[["option", "shortcut", "unique_starting_substring"]]
+
+                if seq_length - start_index == 0:
+                    expanded_row[shortcut] = False
+                    continue
+
+                match = (seq_text[start_index:start_index + len(uss)] == uss)
+                expanded_row[shortcut] = match
+
+                if match:
+                    start_index += len(option)
+                    if seq_length - start_index > 0:
+                        start_index += 2
+
+            if seq_length - start_index > 0:
+                expanded_row[f"{seq_col}_other"] = seq_text[start_index:]
+            else:
+                expanded_row[f"{seq_col}_other"] = np.nan
+
+        expanded_row_list.append(expanded_row)
+
+    expanded_df = pd.DataFrame(expanded_row_list).reset_index(drop = True)
+
+    return expanded_df
+
+def expand_vectorized(melted_df, option_df, seq_cols = ("interests", "characteristics")):
+    """Expansion as done in clean_1_expand.py, using the compiled parsers."""
+
+    option_parsers = {
+        seq_col: cgf.compile_option_parser(option_df, seq_col)
+        for seq_col in seq_cols
+    }
+
+    expanded_df = (
+        pd.concat(
+            [melted_df[["name", "location", "respondent_code", "college_type"]]]
+            + [
+                cgf.expand_seq_col(melted_df[seq_col], option_parsers[seq_col])
+                for seq_col in seq_cols
+            ],
+            axis = 1,
+        )
+        .infer_objects()
+        .reset_index(drop = True)
+    )
+
+    return expanded_df
+
+def bench_expand(check_rows = 2_000, sizes = (10_000, 100_000, 1_000_000)):
+    """Check the compiled parsers against the original loop, then time them at larger sizes."""
+
+    option_df = make_options()
+
+    melted_df = make_melted(check_rows, option_df)
+
+    fast_df, fast_seconds = time_function(expand_vectorized, melted_df, option_df)
+    slow_df, slow_seconds = time_function(expand_rowwise, melted_df, option_df)
+
+    same_output = fast_df.to_csv(index = False) == slow_df.to_csv(index = False)
+
+    print(f"{check_rows} rows: rowwise {slow_seconds:.2f}s, vectorized {fast_seconds:.4f}s, same output: {same_output}")
+
+    result_rows = []
+
+    for num_rows in sizes:
+        melted_df = make_melted(num_rows, option_df)
+        fast_df, fast_seconds = time_function(expand_vectorized, melted_df, option_df)
+        result_rows.append([num_rows, fast_seconds])
+
+    result_df = pd.DataFrame(result_rows, columns = ["num_rows", "vectorized_seconds"])
+
+    return result_df
+
+#%%
+# Matching college names
+
+def make_college_names(num_common, num_names, num_distinct = 20_000, seed = 0):
+    """Make synthetic common names, and survey names that are mostly misspelled copies of them."""
+
+    rng = np.random.default_rng(seed)
+
+    words = [
+        "".join(rng.choice(list("abcdefghijklmnopqrstuvwxyz"), size = rng.integers(3, 10)))
+        for i in range(2_000)
+    ]
+    prefixes = ["University of", "College of", "Institute of", "Academy of", "School of"]
+
+    common_names = pd.Series([
+        f"{rng.choice(prefixes)} {rng.choice(words).title()} {rng.choice(words).title()}"
+        for i in range(num_common)
+    ])
+
+    distinct_names = []
+    for i in range(num_distinct):
+        name = common_names.iloc[rng.integers(num_common)]
+        kind = rng.random()
+        if kind < 0.3:
+            # Delete one character
+            pos = rng.integers(len(name))
+            name = name[:pos] + name[pos + 1:]
+        elif kind < 0.5:
+            name = name.upper()
+        elif kind < 0.6:
+            # A name that is not in the list of common names
+            name = f"{rng.choice(words).title()} {rng.choice(words).title()} College"
+        distinct_names.append(name)
+
+    names = pd.Series(np.array(distinct_names, dtype = object)[rng.integers(0, num_distinct, num_names)])
+
+    return common_names, names
+
+def match_names_bruteforce(names_pp, common_pp, threshold = 0.8):
+    """Original matching loop from clean_3_college_names.py, which scores every common name for every row."""
+
+    results = []
+
+    for name_pp in names_pp:
+        scores = common_pp.apply(lambda s1: Levenshtein.ratio(s1, name_pp))
+        best_index = scores.idxmax()
+        best_score = scores.loc[best_index]
+
+        if best_score < threshold:
+            results.append([-1, 0])
+        else:
+            results.append([best_index, best_score])
+
+    return pd.DataFrame(results, columns = ["best_index", "score"], index = names_pp.index)
+
+def bench_match(num_common = 5_000, num_names = 100_000, check_names = 200, num_processes = 4):
+    """Check the indexed matcher against the brute force scan, then time it on the full set of names."""
+
+    common_names, names = make_college_names(num_common, num_names)
+
+    common_pp = cnm.preprocess_names(common_names)
+    names_pp = cnm.preprocess_names(names)
+
+    # The brute force scan is too slow for the full set, so it is timed on a sample and extrapolated.
+    sample_pp = names_pp.iloc[:check_names]
+
+    slow_df, slow_seconds = time_function(match_names_bruteforce, sample_pp, common_pp)
+    fast_sample_df, counts = cnm.match_names(sample_pp, common_pp)
+
+    same_output = (
+        slow_df["best_index"].eq(fast_sample_df["best_index"]).all()
+        and slow_df["score"].eq(fast_sample_df["score"]).all()
+    )
+
+    (fast_df, counts), fast_seconds = time_function(cnm.match_names, names_pp, common_pp)
+    (pool_df, counts), pool_seconds = time_function(cnm.match_names, names_pp, common_pp, num_processes = num_processes)
+
+    result_df = pd.DataFrame(
+        [
+            ["brute force (extrapolated)", slow_seconds / check_names * num_names],
+            ["indexed", fast_seconds],
+            [f"indexed, {num_processes} processes", pool_seconds],
+        ],
+        columns = ["method", "seconds"],
+    )
+
+    print(f"{num_names} names against {num_common} common names. Same output on a sample of {check_names}: {same_output}")
+
+    return result_df
+
+#%%
+# Replacing final college names
+
+def replace_final_names_rowwise(survey_df, names_final_df):
+    """Original nested loop from clean_5_college_names.py."""
+
+    new_row_list = []
+    changed_row_list = []
+
+    for sur_index, sur_row in survey_df.iterrows():
+        new_row = sur_row.copy()
+        changed = False
+
+        for nf_index, nf_row in names_final_df.iterrows():
+            if sur_row["name"] == nf_row["name_choice"]:
+                changed = True
+                new_row["name"] = nf_row["final_name"]
+
+        new_row_list.append(new_row)
+
+        if changed:
+            changed_row = new_row.copy()
+            changed_row["orig_name"] = sur_row["name"]
+            changed_row_list.append(changed_row[["index", "name", "orig_name"]])
+
+    return pd.DataFrame(new_row_list), pd.DataFrame(changed_row_list)
+
+def bench_final_names(sizes = (1_000, 5_000), num_final_names = 200, seed = 0):
+    """Compare the nested loop with cgf.replace_final_names()."""
+
+    rng = np.random.default_rng(seed)
+
+    # Some names appear twice, with different locations, like in names_locations_manually_fixed.csv.
+    names_final_df = pd.DataFrame({
+        "name_choice": [f"College {i % (num_final_names - 20)}" for i in range(num_final_names)],
+        "final_name": [f"Final College {i}" for i in range(num_final_names)],
+    })
+
+    result_rows = []
+
+    for num_rows in sizes:
+        survey_df = pd.DataFrame({
+            "index": np.arange(num_rows),
+            "name": [f"College {i}" for i in rng.integers(0, 2 * num_final_names, num_rows)],
+            "respondent_code": [f"R{i:06d}" for i in range(num_rows)],
+            "int_stem": rng.random(num_rows) < 0.5,
+        })
+
+        (fast_df, fast_changed), fast_seconds = time_function(cgf.replace_final_names, survey_df, names_final_df)
+        (slow_df, slow_changed), slow_seconds = time_function(replace_final_names_rowwise, survey_df, names_final_df)
+
+        same_output = (
+            fast_df.to_csv(index = False) == slow_df.to_csv(index = False)
+            and fast_changed.to_csv(index = False) == slow_changed.to_csv(index = False)
+        )
+
+        result_rows.append([num_rows, slow_seconds, fast_seconds, same_output])
+
+    result_df = pd.DataFrame(
+        result_rows,
+        columns = ["num_rows", "rowwise_seconds", "dictionary_seconds", "same_output"],
+    )
+
+    return result_df
+
+#%%
+# Categorizing "Other" answers
+
+def make_other_answers(num_rows, num_answers = 300, num_categories = 8, seed = 0):
+    """Make a synthetic expanded dataset, categorized "Other" answers, and categories."""
+
+    rng = np.random.default_rng(seed)
+
+    answers = np.array([f"Other answer {i}" for i in range(num_answers)], dtype = object)
+
+    # Most rows have no "Other" answer. Some answers were never categorized.
+    other_col = answers[rng.integers(0, num_answers, num_rows)]
+    other_col[rng.random(num_rows) < 0.8] = np.nan
+
+    expanded_df = pd.DataFrame({
+        "index": np.arange(num_rows),
+        "name": "College",
+        "char_quality": rng.random(num_rows) < 0.5,
+        "characteristics_other": other_col,
+    })
+
+    char_answers = pd.DataFrame({
+        "orig_text": answers[:num_answers - 20],
+        "category": [f"Category {i % num_categories}" for i in range(num_answers - 20)],
+    })
+
+    category_df = pd.DataFrame({
+        "option": [f"Category {i}" for i in range(num_categories)],
+        "shortcut": [f"char_other_{i}" for i in range(num_categories)],
+        "is_other": True,
+    })
+
+    return expanded_df, char_answers, category_df
+
+def categorize_other_rowwise(expanded_df, char_answers, category_df):
+    """Original loop from clean_2_other_categories.py."""
+
+    new_row_list = []
+
+    for exp_index, exp_row in expanded_df.iterrows():
+        new_row = exp_row.copy().drop("characteristics_other")
+
+        answer = exp_row["characteristics_other"]
+
+        for cat_index, cat_row in category_df.iterrows():
+            orig_text_list = char_answers.loc[
+                char_answers["category"] == cat_row["option"],
+                "orig_text"
+            ].tolist()
+
+            new_row[cat_row["shortcut"]] = answer in orig_text_list
+
+        new_row_list.append(new_row)
+
+    return pd.DataFrame(new_row_list).reset_index(drop = True)
+
+def bench_other(check_rows = 2_000, sizes = (10_000, 100_000, 1_000_000)):
+    """Check cgf.categorize_other() against the original loop, then show that its time grows linearly with the number of rows."""
+
+    expanded_df, char_answers, category_df = make_other_answers(check_rows)
+
+    fast_df, fast_seconds = time_function(cgf.categorize_other, expanded_df, char_answers, category_df)
+    slow_df, slow_seconds = time_function(categorize_other_rowwise, expanded_df, char_answers, category_df)
+
+    same_output = fast_df.to_csv(index = False) == slow_df.to_csv(index = False)
+
+    print(f"{check_rows} rows: rowwise {slow_seconds:.2f}s, lookup {fast_seconds:.4f}s, same output: {same_output}")
+
+    result_rows = []
+
+    for num_rows in sizes:
+        expanded_df, char_answers, category_df = make_other_answers(num_rows)
+        fast_df, fast_seconds = time_function(cgf.categorize_other, expanded_df, char_answers, category_df)
+        result_rows.append([num_rows, fast_seconds, fast_seconds / num_rows * 1e6])
+
+    result_df = pd.DataFrame(result_rows, columns = ["num_rows", "lookup_seconds", "microseconds_per_row"])
+
+    return result_df
+
+if __name__ == "__main__":
+    print(bench_melt().to_string())
+    print(bench_expand().to_string())
+    print(bench_match().to_string())
+    print(bench_final_names().to_string())
+    print(bench_other().to_string())
+#%%
@@ -1,11 +1,15 @@
 # Cleaning part 3: Normalize the column of college names.
 
 #%%
+import os
+
 import pandas as pd
 import numpy as np
-import Levenshtein
 
-survey_df = pd.read_csv("./private/cleaning_outputs/expanded_with_other.csv")
+import clean_general_functions as cgf
+import clean_name_matching as cnm
+
+survey_df = cgf.read_output("expanded_with_other")
 
 survey_df.head()
 # %%
@@ -46,56 +50,54 @@ common_names
 #%%
 # Preprocessing
 
-preprocess = lambda series: (
-    series
-    .str.lower()
-    .str.strip()
-    .str.replace(r"[^a-zA-Z0-9]", "", regex = True)
-)
-
-common_pp = preprocess(common_names)
+common_pp = cnm.preprocess_names(common_names)
 survey_pp = survey_df[["index", "name", "location"]].copy()
 
-survey_pp["name_pp"] = preprocess(survey_pp["name"])
+survey_pp["name_pp"] = cnm.preprocess_names(survey_pp["name"])
 
 survey_pp.head(10)
 #%%
 # Matching
 
-# Function that can be used in df.apply()
-def lv_ratio(s1, s2):
-    return Levenshtein.ratio(s1, s2)
-
-match_row_list = []
+# Matches from earlier runs are saved in this file, so only names that were not seen before are scored.
+match_cache_path = "./private/cleaning_outputs/name_match_cache.sqlite"
 
-for sur_index, sur_row in survey_pp.iterrows():
-    # The new row will include the original name and the index, but not the preprocessed name.
-    new_row = sur_row[["index", "name", "location"]].copy()
+# Each distinct name is matched once. Common names that cannot reach the threshold are skipped without being scored.
+best_matches, match_counts = cnm.match_names(
+    survey_pp["name_pp"],
+    common_pp,
+    threshold = 0.8,
+    cache_path = match_cache_path,
+)
 
-    name = sur_row["name"]
-    name_pp = sur_row["name_pp"]
-    scores = common_pp.apply(lv_ratio, s2 = name_pp)
-    best_index = scores.idxmax()
-    best_score = scores.loc[best_index]
+print(f"Name matches: {match_counts['cached']} from cache, {match_counts['scored']} newly scored.")
 
-    # If score is lower than 80%, it is likely that the match is wrong. Thus, the "best match" should just be replaced by the original name.
-    if best_score < 0.8:
-        best_score = 0
-        best_match = name
-    else:
-        best_match = common_names.loc[best_index]
+# The new rows will include the original name and the index, but not the preprocessed name.
+match_df = survey_pp[["index", "name", "location"]].copy()
 
-    new_row["score"] = best_score
-    new_row["match"] = best_match
+match_df["score"] = best_matches["score"]
 
-    match_row_list.append(new_row)
+# If score is lower than 80%, it is likely that the match is wrong. Thus, the "best match" should just be replaced by the original name.
+has_match = best_matches["best_index"] >= 0
+match_df["match"] = match_df["name"]
+match_df.loc[has_match, "match"] = common_names.to_numpy()[best_matches.loc[has_match, "best_index"]]
 
-match_df = (
-    pd.DataFrame(match_row_list)
-    .sort_values(by = ["score", "index"], ascending = True)
-)
+match_df = match_df.sort_values(by = ["score", "index"], ascending = True)
 
 match_df.to_csv("./private/cleaning_outputs/match_df.csv", index = False)
 
 match_df.head()
+#%%
+# Save the manual fixes made so far, then fill them in for rows with names and locations that were already fixed before.
+# Copy the prefilled file to match_df_manually_fixed.csv and only fix the rows that are still empty.
+manual_fix_path = "./private/college_names/match_df_manually_fixed.csv"
+
+if os.path.exists(manual_fix_path):
+    cnm.store_overrides(match_cache_path, pd.read_csv(manual_fix_path))
+
+prefilled_df = cnm.apply_overrides(match_cache_path, match_df)
+
+prefilled_df.to_csv("./private/cleaning_outputs/match_df_prefilled.csv", index = False)
+
+prefilled_df.loc[prefilled_df["name_revised"].notnull() | prefilled_df["location_revised"].notnull()]
 #%%
\ No newline at end of file
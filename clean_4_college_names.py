@@ -4,7 +4,9 @@
 import pandas as pd
 import numpy as np
 
-survey_df = pd.read_csv("./private/cleaning_outputs/expanded_with_other.csv")
+import clean_general_functions as cgf
+
+survey_df = cgf.read_output("expanded_with_other")
 
 survey_df.head()
 # %%
@@ -64,7 +66,7 @@ output_df = (
     .sort_values("index", ascending = True)
 )
 
-output_df.to_csv("./private/cleaning_outputs/cleaned_college_names_not_final.csv", index = False)
+cgf.write_output(output_df, "cleaned_college_names_not_final")
 #%%
 names_locations = (
     merged_df[["name_choice", "location_choice"]]
@@ -4,9 +4,11 @@
 import pandas as pd
 import numpy as np
 
+import clean_general_functions as cgf
+
 #%%
 
-survey_df = pd.read_csv("./private/cleaning_outputs/cleaned_college_names_not_final.csv")
+survey_df = cgf.read_output("cleaned_college_names_not_final")
 
 survey_df.head()
 # %%
@@ -16,26 +18,8 @@ names_final_df = names_final_df.loc[names_final_df["final_name"].notnull()]
 
 names_final_df.head()
 #%%
-new_row_list = []
-changed_row_list = []
-for sur_index, sur_row in survey_df.iterrows():
-    new_row = sur_row.copy()
-    changed = False
-
-    for nf_index, nf_row in names_final_df.iterrows():
-        if sur_row["name"] == nf_row["name_choice"]:
-            changed = True
-            new_row["name"] = nf_row["final_name"]
-    
-    new_row_list.append(new_row)
-
-    if changed:
-        changed_row = new_row.copy()
-        changed_row["orig_name"] = sur_row["name"]
-        changed_row = changed_row[["index", "name", "orig_name"]]
-        changed_row_list.append(changed_row)
-
-cleaned_df = pd.DataFrame(new_row_list)
+with cgf.report_time(f"Final name replacement ({survey_df.shape[0]} rows, {names_final_df.shape[0]} final names)"):
+    cleaned_df, changed_df = cgf.replace_final_names(survey_df, names_final_df)
 
 cleaned_df.head()
 #%%
@@ -49,8 +33,6 @@ cleaned_df["location"] = cleaned_df["location"].str.replace(
 cleaned_df.location.value_counts()
 #%%
 # Compare original and new
-changed_df = pd.DataFrame(changed_row_list)
-
 changed_df
 #%%
 # Final check by summarizing unique college names
@@ -65,6 +47,6 @@ names_last_check.to_csv("./private/cleaning_outputs/names_last_check.csv", index
 names_last_check.head()
 #%%
 # If last check shows no problems, save the final cleaned dataset.
-cleaned_df.to_csv("./private/cleaning_outputs/cleaned_college_names_final.csv", index = False)
+cgf.write_output(cleaned_df, "cleaned_college_names_final")
 
 #%%
\ No newline at end of file
@@ -4,8 +4,10 @@
 #%%
 import pandas as pd
 import numpy as np
+
+import clean_general_functions as cgf
 # %%
-full_df = pd.read_csv("./private/cleaning_outputs/cleaned_college_names_final.csv")
+full_df = cgf.read_output("cleaned_college_names_final")
 
 full_df.head()
 # %%
@@ -19,7 +21,7 @@ assert no_dupe_colleges
 college_df
 # %%
 # Save to a file
-college_df.to_csv("./private/cleaning_outputs/colleges_sheet.csv", index = False)
+cgf.write_output(college_df, "colleges_sheet")
 
 # %%
 # Remove the separated info from the main sheet
@@ -28,5 +30,5 @@ main_df = full_df.drop(["location", "college_type"], axis = 1)
 
 main_df.head()
 # %%
-main_df.to_csv("./private/cleaning_outputs/main_sheet.csv", index = False)
+cgf.write_output(main_df, "main_sheet")
 #%%
\ No newline at end of file
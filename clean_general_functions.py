@@ -0,0 +1,230 @@
+import os
+import re
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import pandas as pd
+import numpy as np
+
+# Folder of the files passed between cleaning stages.
+OUTPUTS_FOLDER = "./private/cleaning_outputs"
+
+# Whether to also write a CSV copy of each intermediate table, for manual review.
+# Set the environment variable CLEANING_EXPORT_CSV to 0 to skip the copies.
+EXPORT_CSV = os.environ.get("CLEANING_EXPORT_CSV", "1") != "0"
+
+# Maps the first part of a column group name to a college type.
+# For example, "loc_1" is a local college and "int_1" is an international college.
+COLLEGE_TYPE_DICT = {
+    "loc": "local",
+    "int": "international",
+}
+
+def write_output(df, name, export_csv = None):
+    """Save an intermediate table as Parquet, which keeps column types, and optionally as CSV."""
+
+    if export_csv is None:
+        export_csv = EXPORT_CSV
+
+    df.to_parquet(f"{OUTPUTS_FOLDER}/{name}.parquet", index = False)
+
+    if export_csv:
+        df.to_csv(f"{OUTPUTS_FOLDER}/{name}.csv", index = False)
+
+    return None
+
+def read_output(name):
+    """Read an intermediate table saved by write_output()."""
+
+    df = pd.read_parquet(f"{OUTPUTS_FOLDER}/{name}.parquet")
+
+    return df
+
+@contextmanager
+def report_time(label):
+    """Print how long the code inside a `with` block took to run."""
+
+    start = time.perf_counter()
+    yield
+    seconds = time.perf_counter() - start
+
+    print(f"{label}: {seconds:.3f} seconds")
+
+def melt_survey(survey_df, data_dict, college_type_dict = COLLEGE_TYPE_DICT):
+    """Melt the survey so that each row is one college application instead of one respondent.
+
+    The columns in each column group of the data dictionary are stacked on top of each other with one NumPy reshape. Rows are ordered by respondent first and by column group second, like the original row-by-row loop."""
+
+    group_df = data_dict.loc[
+        data_dict["col_group"].notnull(),
+        ["col_group", "new_col_name"],
+    ]
+
+    unique_col_groups = group_df["col_group"].unique()
+
+    col_group_lists = {
+        cg: group_df.loc[group_df["col_group"] == cg, "new_col_name"].tolist()
+        for cg in unique_col_groups
+    }
+
+    # Split column name on underscores and take the third item.
+    # For example, "loc_1_name" becomes "name".
+    info_types = [col_name.split("_")[2] for col_name in col_group_lists[unique_col_groups[0]]]
+
+    # The reshape only works if every column group has the same info types in the same order.
+    for cg, col_list in col_group_lists.items():
+        cg_info_types = [col_name.split("_")[2] for col_name in col_list]
+        if cg_info_types != info_types:
+            raise ValueError(f"Column group {cg} has info types {cg_info_types}, expected {info_types}.")
+
+    num_respondents = survey_df.shape[0]
+    num_groups = len(unique_col_groups)
+    num_info_types = len(info_types)
+
+    flat_cols = [col_name for col_list in col_group_lists.values() for col_name in col_list]
+
+    # Shape (respondents, groups * info types) becomes (respondents * groups, info types).
+    values = (
+        survey_df[flat_cols]
+        .to_numpy(dtype = object)
+        .reshape(num_respondents * num_groups, num_info_types)
+    )
+
+    # Split column group name on underscores and take the first item.
+    # For example, "loc_1" becomes "loc".
+    group_college_types = [college_type_dict[cg.split("_")[0]] for cg in unique_col_groups]
+
+    melted_df = pd.DataFrame(values, columns = info_types)
+    melted_df["respondent_code"] = np.repeat(survey_df["respondent_code"].to_numpy(dtype = object), num_groups)
+    melted_df["college_type"] = np.tile(np.array(group_college_types, dtype = object), num_respondents)
+
+    melted_df = (
+        melted_df
+        # Infer column types the same way pd.DataFrame() does for a list of rows.
+        .infer_objects()
+        .dropna(
+            subset = ["name", "interests", "characteristics", "location"],
+            how = "all",
+        )
+        .reset_index(drop = True)
+    )
+
+    return melted_df
+
+# A compiled parser for one sequence-type column, such as "interests".
+OptionParser = namedtuple("OptionParser", ["seq_col", "shortcuts", "pattern"])
+
+def compile_option_parser(option_df, seq_col):
+    """Compile the options of one info_type into a single regular expression.
+
+    Options are tried in the order they appear in options.csv. An option matches if the text at the current position starts with its unique starting substring. The scan then skips the full option and the ", " separator after it. Whatever remains after the last option is the "Other" answer."""
+
+    sub_df = option_df.loc[option_df["info_type"] == seq_col]
+
+    option_patterns = []
+
+    for option, uss in zip(sub_df["option"], sub_df["unique_starting_substring"]):
+        opt_length = len(option)
+
+        # Skip the option itself, then the 2 separator characters.
+        # If the text ends before the option or the separator does, the scan stops at the end of the text.
+        skip = f".{{{opt_length}}}(?:.{{2}}|.?\\Z)"
+        if opt_length > 1:
+            skip = f"(?:{skip}|.{{0,{opt_length - 1}}}\\Z)"
+
+        option_patterns.append(f"((?={re.escape(uss)}){skip})?")
+
+    pattern = re.compile(
+        r"\A" + "".join(option_patterns) + r"(.*)\Z",
+        flags = re.DOTALL,
+    )
+
+    parser = OptionParser(
+        seq_col = seq_col,
+        shortcuts = sub_df["shortcut"].tolist(),
+        pattern = pattern,
+    )
+
+    return parser
+
+def expand_seq_col(series, parser):
+    """Expand a sequence-type column into one boolean column per option and an "Other" column.
+
+    Each distinct answer is parsed only once, then the results are spread back out to all rows."""
+
+    codes, uniques = pd.factorize(series)
+
+    num_options = len(parser.shortcuts)
+
+    # The last row is for NaN answers, which have code -1.
+    unique_bools = np.zeros((len(uniques) + 1, num_options), dtype = bool)
+    unique_other = np.full(len(uniques) + 1, np.nan, dtype = object)
+
+    for i, seq_text in enumerate(uniques):
+        groups = parser.pattern.match(seq_text).groups()
+
+        unique_bools[i] = [group is not None for group in groups[:num_options]]
+
+        # Remaining characters are the "Other" option, which was manually typed by the respondent.
+        if len(groups[-1]) > 0:
+            unique_other[i] = groups[-1]
+
+    expanded = pd.DataFrame(
+        unique_bools[codes],
+        columns = parser.shortcuts,
+        index = series.index,
+    )
+
+    expanded[f"{parser.seq_col}_other"] = unique_other[codes]
+
+    return expanded
+
+def replace_final_names(survey_df, names_final_df):
+    """Replace college names with their final names, using a dictionary lookup.
+
+    If a name appears more than once in names_final_df, the last final name is used. Returns the cleaned DataFrame and a DataFrame of the rows that were changed, with their original names."""
+
+    # dict() keeps the last value for repeated keys.
+    final_names = dict(zip(names_final_df["name_choice"], names_final_df["final_name"]))
+
+    orig_names = survey_df["name"]
+    changed_mask = orig_names.isin(final_names.keys()) & orig_names.notnull()
+
+    cleaned_df = survey_df.copy()
+    cleaned_df.loc[changed_mask, "name"] = orig_names.loc[changed_mask].map(final_names)
+
+    changed_df = cleaned_df.loc[changed_mask, ["index", "name"]].copy()
+    changed_df["orig_name"] = orig_names.loc[changed_mask]
+
+    return cleaned_df, changed_df
+
+def categorize_other(expanded_df, char_answers, category_df, other_col = "characteristics_other"):
+    """Replace a column of "Other" answers with one boolean column per category.
+
+    An answer -> categories lookup is built once from char_answers. Each distinct answer is looked up once, then the results are spread back out to all rows."""
+
+    # An answer may belong to more than one category.
+    answer_categories = {}
+    for orig_text, category in zip(char_answers["orig_text"], char_answers["category"]):
+        if isinstance(orig_text, str):
+            answer_categories.setdefault(orig_text, set()).add(category)
+
+    codes, uniques = pd.factorize(expanded_df[other_col])
+
+    # The last row is for NaN answers, which have code -1 and are never in any category.
+    categories = category_df["option"].tolist()
+    unique_bools = np.zeros((len(uniques) + 1, len(categories)), dtype = bool)
+
+    for i, answer in enumerate(uniques):
+        answer_set = answer_categories.get(answer, set())
+        unique_bools[i] = [category in answer_set for category in categories]
+
+    new_df = expanded_df.drop(other_col, axis = 1)
+
+    for j, shortcut in enumerate(category_df["shortcut"]):
+        new_df[shortcut] = unique_bools[codes, j]
+
+    new_df = new_df.reset_index(drop = True)
+
+    return new_df
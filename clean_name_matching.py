@@ -0,0 +1,279 @@
+"""
+Fuzzy matching of college names against a list of common (canonical) names.
+
+The Levenshtein ratio used here is 2 * LCS / (len1 + len2), where LCS is the length of the longest common subsequence. This gives two exact upper bounds on the ratio that are much cheaper than the ratio itself:
+- LCS can be no longer than the shorter name, so names of very different lengths cannot match.
+- LCS can use each character no more often than it appears in both names, so names with few characters in common cannot match.
+Candidates that fail either bound are skipped. Only the survivors are scored, so the result is the same as scoring every pair.
+"""
+
+import string
+import hashlib
+import sqlite3
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pandas as pd
+import numpy as np
+import Levenshtein
+
+# Characters that remain after preprocessing.
+ALPHABET = string.ascii_lowercase + string.digits
+
+# Small tolerance so that floating point rounding never prunes a candidate that should be scored.
+EPSILON = 1e-9
+
+def preprocess_names(series):
+    """Lowercase names and remove all characters that are not letters or digits."""
+
+    result = (
+        series
+        .str.lower()
+        .str.strip()
+        .str.replace(r"[^a-zA-Z0-9]", "", regex = True)
+    )
+
+    return result
+
+def count_chars(names):
+    """Count how many times each character of ALPHABET appears in each name."""
+
+    counts = np.zeros((len(names), len(ALPHABET)), dtype = np.int16)
+
+    for i, name in enumerate(names):
+        for j, char in enumerate(ALPHABET):
+            counts[i, j] = name.count(char)
+
+    return counts
+
+NameIndex = namedtuple("NameIndex", ["names", "lengths", "char_counts", "exact", "threshold"])
+
+def build_name_index(common_pp, threshold = 0.8):
+    """Index the preprocessed common names by length and character counts."""
+
+    names = list(common_pp)
+
+    # Map each name to its first position, so exact matches can be found without scoring.
+    exact = {}
+    for i, name in enumerate(names):
+        exact.setdefault(name, i)
+
+    index = NameIndex(
+        names = names,
+        lengths = np.array([len(name) for name in names]),
+        char_counts = count_chars(names),
+        exact = exact,
+        threshold = threshold,
+    )
+
+    return index
+
+def find_best_match(name_pp, index):
+    """Find the position and score of the best matching common name.
+
+    Ties go to the common name that appears first, like pd.Series.idxmax(). If the best score is lower than the threshold, the position is -1 and the score is 0."""
+
+    if name_pp in index.exact:
+        return index.exact[name_pp], 1.0
+
+    threshold = index.threshold
+    length = len(name_pp)
+
+    # Length bound: 2 * min(len1, len2) / (len1 + len2) >= threshold
+    min_length = length * threshold / (2 - threshold) - EPSILON
+    max_length = length * (2 - threshold) / threshold + EPSILON
+    length_mask = (index.lengths >= min_length) & (index.lengths <= max_length)
+
+    candidates = np.flatnonzero(length_mask)
+
+    # Character count bound: 2 * (number of shared characters) / (len1 + len2) >= threshold
+    shared_chars = np.minimum(
+        index.char_counts[candidates],
+        count_chars([name_pp])[0],
+    ).sum(axis = 1)
+    needed_chars = threshold * (length + index.lengths[candidates]) / 2 - EPSILON
+
+    candidates = candidates[shared_chars >= needed_chars]
+
+    best_index = -1
+    best_score = 0
+
+    # Candidates are in their original order, so a strict comparison keeps the first of any ties.
+    for i in candidates:
+        score = Levenshtein.ratio(index.names[i], name_pp)
+        if score > best_score:
+            best_index = i
+            best_score = score
+
+    # If score is lower than the threshold, it is likely that the match is wrong.
+    if best_score < threshold:
+        return -1, 0
+
+    return best_index, best_score
+
+def match_unique_names(unique_names, index):
+    """Find the best match of each name in a list of distinct names."""
+
+    results = [find_best_match(name_pp, index) for name_pp in unique_names]
+
+    return results
+
+def name_list_version(common_pp, threshold):
+    """Make a short hash that changes whenever the common names or the threshold change."""
+
+    text = "\n".join(common_pp) + f"\n{threshold}"
+    version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+    return version
+
+def open_match_cache(cache_path):
+    """Open the SQLite file that stores past matches and manual fixes, creating its tables if needed."""
+
+    conn = sqlite3.connect(cache_path)
+
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS matches (
+            version TEXT,
+            name_pp TEXT,
+            best_index INTEGER,
+            score REAL,
+            PRIMARY KEY (version, name_pp)
+        )"""
+    )
+
+    # Missing locations are stored as empty strings, because NULLs are never equal in a primary key.
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS overrides (
+            name_pp TEXT,
+            location TEXT,
+            name_revised TEXT,
+            location_revised TEXT,
+            PRIMARY KEY (name_pp, location)
+        )"""
+    )
+
+    return conn
+
+def match_names(names_pp, common_pp, threshold = 0.8, num_processes = 1, chunk_size = 2_000, cache_path = None):
+    """Match each preprocessed name to the most similar preprocessed common name.
+
+    Repeated names are only matched once. If num_processes is more than 1, the distinct names are split into chunks and matched in a process pool. If cache_path is given, matches from previous runs with the same common names are reused, and only new names are scored.
+
+    Returns a DataFrame with the same index as names_pp, and a dictionary with the number of distinct names that were taken from the cache and that were newly scored. The `best_index` column is the position of the best match in common_pp, or -1 if there is no match. The `score` column is the ratio of the best match, or 0 if there is no match. Missing names have no match, with a `best_index` of -1 and a `score` of NaN."""
+
+    codes, unique_names = pd.factorize(names_pp)
+    unique_names = list(unique_names)
+
+    cached = {}
+
+    if cache_path is not None:
+        version = name_list_version(common_pp, threshold)
+        conn = open_match_cache(cache_path)
+
+        for name_pp, best_index, score in conn.execute(
+            "SELECT name_pp, best_index, score FROM matches WHERE version = ?",
+            (version,),
+        ):
+            # "No match" is stored as a REAL 0.0 but is an integer 0 everywhere else.
+            cached[name_pp] = (best_index, score) if best_index >= 0 else (-1, 0)
+
+    new_names = [name_pp for name_pp in unique_names if name_pp not in cached]
+
+    index = build_name_index(common_pp, threshold = threshold)
+
+    if num_processes > 1 and len(new_names) > chunk_size:
+        chunks = [
+            new_names[start:start + chunk_size]
+            for start in range(0, len(new_names), chunk_size)
+        ]
+
+        with ProcessPoolExecutor(max_workers = num_processes) as executor:
+            chunk_results = executor.map(partial(match_unique_names, index = index), chunks)
+            new_results = [result for chunk in chunk_results for result in chunk]
+    else:
+        new_results = match_unique_names(new_names, index)
+
+    if cache_path is not None:
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO matches VALUES (?, ?, ?, ?)",
+                [
+                    (version, name_pp, int(best_index), float(score))
+                    for name_pp, (best_index, score) in zip(new_names, new_results)
+                ],
+            )
+        conn.close()
+
+    cached.update(zip(new_names, new_results))
+    results = [cached[name_pp] for name_pp in unique_names]
+
+    # The last row is for missing names, which have code -1 and are never matched.
+    unique_best_index = np.array([result[0] for result in results] + [-1], dtype = np.int64)
+
+    # Keep scores as Python objects so that "no match" stays an integer 0, like the original script.
+    unique_score = np.empty(len(results) + 1, dtype = object)
+    unique_score[:] = [result[1] for result in results] + [np.nan]
+
+    match_df = pd.DataFrame(
+        {
+            "best_index": unique_best_index[codes],
+            "score": unique_score[codes],
+        },
+        index = names_pp.index,
+    ).infer_objects()
+
+    counts = {
+        "cached": len(unique_names) - len(new_names),
+        "scored": len(new_names),
+    }
+
+    return match_df, counts
+
+def store_overrides(cache_path, match_edited_df):
+    """Save the manual fixes in match_df_manually_fixed.csv, keyed by preprocessed name and location."""
+
+    fixed_df = match_edited_df.loc[
+        match_edited_df["name_revised"].notnull()
+        | match_edited_df["location_revised"].notnull()
+    ]
+
+    rows = zip(
+        preprocess_names(fixed_df["name"]),
+        fixed_df["location"].fillna(""),
+        fixed_df["name_revised"].astype(object).where(fixed_df["name_revised"].notnull(), None),
+        fixed_df["location_revised"].astype(object).where(fixed_df["location_revised"].notnull(), None),
+    )
+
+    conn = open_match_cache(cache_path)
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO overrides VALUES (?, ?, ?, ?)", rows)
+    conn.close()
+
+    return None
+
+def apply_overrides(cache_path, match_df):
+    """Add `name_revised` and `location_revised` columns filled in from previously saved manual fixes."""
+
+    conn = open_match_cache(cache_path)
+    overrides_df = pd.read_sql_query("SELECT * FROM overrides", conn)
+    conn.close()
+
+    keyed_df = match_df.copy()
+    keyed_df["name_pp"] = preprocess_names(keyed_df["name"])
+    keyed_df["location_key"] = keyed_df["location"].fillna("")
+
+    result = (
+        keyed_df
+        .merge(
+            right = overrides_df.rename(columns = {"location": "location_key"}),
+            on = ["name_pp", "location_key"],
+            how = "left",
+        )
+        .drop(["name_pp", "location_key"], axis = 1)
+    )
+
+    # merge() resets the index, so put back the original one.
+    result.index = match_df.index
+
+    return result
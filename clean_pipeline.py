@@ -0,0 +1,243 @@
+"""
+Run the cleaning scripts in order, skipping the ones whose inputs have not changed.
+
+Each stage declares its script, the files it reads and the files it writes. A stage's fingerprint is a hash of the contents of its script, the helper modules it imports, and its input files. A stage is run again only if its fingerprint changed since its last successful run, or if one of its outputs is missing.
+
+Usage, from the repository root:
+    python clean_pipeline.py            # run the stages that changed
+    python clean_pipeline.py --force    # run every stage
+    python clean_pipeline.py --from clean_4_college_names   # force this stage and the ones after it
+    python clean_pipeline.py --no-csv   # skip the CSV copies of the Parquet tables
+
+Tables passed between stages are Parquet files. CSV copies of them are also written for manual review, unless --no-csv is given.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import runpy
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+INPUTS = "./private/initial_inputs"
+OUTPUTS = "./private/cleaning_outputs"
+OTHER = "./private/other_answers"
+NAMES = "./private/college_names"
+
+STATE_PATH = f"{OUTPUTS}/pipeline_state.json"
+
+# Stages in the order they have to run.
+# `optional_inputs` are files that are used if they exist, such as manual fixes that are only made after the first run.
+STAGES = [
+    {
+        "script": "clean_1_expand.py",
+        "modules": ["clean_general_functions.py"],
+        "inputs": [
+            f"{INPUTS}/data_dictionary.csv",
+            f"{INPUTS}/survey_data_edited.csv",
+            f"{INPUTS}/options.csv",
+        ],
+        "outputs": [
+            f"{OUTPUTS}/melted_df.parquet",
+            f"{OUTPUTS}/expanded_df.parquet",
+            f"{OUTPUTS}/other_df.csv",
+            f"{OUTPUTS}/characteristics_other.csv",
+        ],
+    },
+    {
+        "script": "clean_2_other_categories.py",
+        "modules": ["clean_general_functions.py"],
+        "inputs": [
+            f"{OUTPUTS}/expanded_df.parquet",
+            f"{OTHER}/characteristics_other_answers.csv",
+            f"{OTHER}/options_with_others.csv",
+        ],
+        "outputs": [
+            f"{OUTPUTS}/expanded_with_other.parquet",
+        ],
+    },
+    {
+        "script": "clean_3_college_names.py",
+        "modules": ["clean_general_functions.py", "clean_name_matching.py"],
+        "inputs": [
+            f"{OUTPUTS}/expanded_with_other.parquet",
+            f"{NAMES}/common_names.csv",
+        ],
+        "optional_inputs": [
+            f"{NAMES}/match_df_manually_fixed.csv",
+        ],
+        "outputs": [
+            f"{OUTPUTS}/match_df.csv",
+            f"{OUTPUTS}/match_df_prefilled.csv",
+        ],
+    },
+    {
+        "script": "clean_4_college_names.py",
+        "modules": ["clean_general_functions.py"],
+        "inputs": [
+            f"{OUTPUTS}/expanded_with_other.parquet",
+            f"{NAMES}/match_df_manually_fixed.csv",
+        ],
+        "outputs": [
+            f"{OUTPUTS}/cleaned_college_names_not_final.parquet",
+            f"{OUTPUTS}/names_locations.csv",
+        ],
+    },
+    {
+        "script": "clean_5_college_names.py",
+        "modules": ["clean_general_functions.py"],
+        "inputs": [
+            f"{OUTPUTS}/cleaned_college_names_not_final.parquet",
+            f"{NAMES}/names_locations_manually_fixed.csv",
+        ],
+        "outputs": [
+            f"{OUTPUTS}/names_last_check.csv",
+            f"{OUTPUTS}/cleaned_college_names_final.parquet",
+        ],
+    },
+    {
+        "script": "clean_6_college_locations.py",
+        "modules": ["clean_general_functions.py"],
+        "inputs": [
+            f"{OUTPUTS}/cleaned_college_names_final.parquet",
+        ],
+        "outputs": [
+            f"{OUTPUTS}/colleges_sheet.parquet",
+            f"{OUTPUTS}/main_sheet.parquet",
+        ],
+    },
+]
+
+# Files that have to be made by hand, and the output that they are made from.
+MANUAL_FILES = {
+    f"{OTHER}/characteristics_other_answers.csv": f"{OUTPUTS}/characteristics_other.csv",
+    f"{NAMES}/match_df_manually_fixed.csv": f"{OUTPUTS}/match_df_prefilled.csv",
+    f"{NAMES}/names_locations_manually_fixed.csv": f"{OUTPUTS}/names_locations.csv",
+}
+
+def hash_file(path):
+    """Hash the contents of a file. Missing files get a fixed marker instead."""
+
+    if not os.path.exists(path):
+        return "missing"
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+def stage_name(stage):
+    """Name of a stage, which is its script name without the extension."""
+
+    return os.path.splitext(stage["script"])[0]
+
+def stage_fingerprint(stage):
+    """Hash the script, helper modules and input files of a stage together."""
+
+    paths = (
+        [stage["script"]]
+        + stage["modules"]
+        + stage["inputs"]
+        + stage.get("optional_inputs", [])
+    )
+
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(f"{path}:{hash_file(path)}\n".encode("utf-8"))
+
+    return digest.hexdigest()
+
+def count_rows(path):
+    """Number of data rows in an output file. Parquet files store this in their metadata."""
+
+    if path.endswith(".parquet"):
+        return pq.ParquetFile(path).metadata.num_rows
+
+    return pd.read_csv(path).shape[0]
+
+def load_state():
+    if not os.path.exists(STATE_PATH):
+        return {}
+
+    with open(STATE_PATH) as file:
+        return json.load(file)
+
+def save_state(state):
+    with open(STATE_PATH, "w") as file:
+        json.dump(state, file, indent = 2)
+
+def run_stage(stage):
+    """Run a cleaning script as if it were run from the command line. Returns its wall time in seconds."""
+
+    start = time.perf_counter()
+    runpy.run_path(stage["script"], run_name = "__main__")
+    seconds = time.perf_counter() - start
+
+    return seconds
+
+def run_pipeline(force = False, force_from = None):
+    """Run the stages whose fingerprints changed, and log the time and output row counts of each stage."""
+
+    state = load_state()
+
+    forcing = force
+
+    for stage in STAGES:
+        name = stage_name(stage)
+
+        if name == force_from:
+            forcing = True
+
+        missing_inputs = [path for path in stage["inputs"] if not os.path.exists(path)]
+        if len(missing_inputs) > 0:
+            for path in missing_inputs:
+                if path in MANUAL_FILES:
+                    print(f"{name}: missing {path}. Make it by hand from {MANUAL_FILES[path]}, then run the pipeline again.")
+                else:
+                    print(f"{name}: missing {path}.")
+            print("Stopping.")
+            return False
+
+        fingerprint = stage_fingerprint(stage)
+        outputs_exist = all(os.path.exists(path) for path in stage["outputs"])
+
+        if not forcing and outputs_exist and state.get(name) == fingerprint:
+            print(f"{name}: unchanged, skipped")
+            continue
+
+        seconds = run_stage(stage)
+
+        row_counts = ", ".join(
+            f"{os.path.basename(path)} {count_rows(path)} rows"
+            for path in stage["outputs"]
+        )
+        print(f"{name}: ran in {seconds:.2f} seconds ({row_counts})")
+
+        # Save after every stage so that an error in a later stage does not undo the earlier ones.
+        state[name] = fingerprint
+        save_state(state)
+
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Run the cleaning scripts, skipping stages whose inputs have not changed.")
+    parser.add_argument("--force", action = "store_true", help = "Run every stage.")
+    parser.add_argument("--from", dest = "force_from", choices = [stage_name(stage) for stage in STAGES], help = "Run this stage and every stage after it.")
+    parser.add_argument("--no-csv", action = "store_true", help = "Do not write CSV copies of the Parquet tables.")
+    args = parser.parse_args()
+
+    # Read by clean_general_functions when the first stage imports it.
+    if args.no_csv:
+        os.environ["CLEANING_EXPORT_CSV"] = "0"
+
+    start = time.perf_counter()
+    success = run_pipeline(force = args.force, force_from = args.force_from)
+    print(f"Total: {time.perf_counter() - start:.2f} seconds")
+
+    sys.exit(0 if success else 1)
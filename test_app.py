@@ -0,0 +1,145 @@
+# Checks of the app's faster computations against the original pandas code, on small synthetic data.
+# Run with `python -m pytest test_app.py` from the repository root.
+
+import pandas as pd
+import numpy as np
+
+import app_data as ad
+import app_general_functions as agf
+from app_aggregates import OverviewStore, COLLEGE_TYPE_SETS, option_shares
+from app_indicators import IndicatorStore
+from app_college_index import CollegeIndex
+from app_refresh import DataRefresher
+from bench_app import make_sheets, option_shares_pandas, checkbox_chart_pandas, num_colleges_chart_pandas, college_lookup_pandas, college_lookup_index
+
+def test_option_shares_matches_pandas():
+    rng = np.random.default_rng(0)
+
+    num_rows = 3_000
+    num_respondents = 1_500
+
+    # Some respondents have no applications and are left out of the mean.
+    respondent_codes = np.sort(rng.integers(0, num_respondents, num_rows))
+    option_df = pd.DataFrame(
+        rng.random((num_rows, 30)) < rng.uniform(0.01, 0.5, 30),
+        columns = [f"opt_{i}" for i in range(30)],
+    )
+
+    expected = option_shares_pandas(option_df, respondent_codes)
+
+    dense = option_shares(option_df.to_numpy(), respondent_codes, num_respondents)
+    sparse = option_shares(IndicatorStore.from_frame(option_df, option_df.columns.tolist()), respondent_codes, num_respondents)
+
+    assert np.array_equal(dense, expected)
+    assert np.array_equal(sparse, expected)
+
+def test_overview_store_matches_pandas():
+    sheets = make_sheets(num_colleges = 50, num_options = 20, num_rows = 2_000)
+    db = ad.build_db(sheets)
+    original_db = ad.build_db(sheets, compact = False)
+
+    store = OverviewStore(db.ddict).update(db.main, ad.load_indicators(db))
+
+    for college_types in COLLEGE_TYPE_SETS:
+        for info_type in ["location", "interests", "characteristics"]:
+            expected = checkbox_chart_pandas(original_db, info_type, set(college_types))
+            result = store.checkbox_chart(info_type, set(college_types))
+
+            pd.testing.assert_frame_equal(result[expected.columns], expected)
+
+def test_make_perc_col_matches_add_perc_symbol():
+    rng = np.random.default_rng(0)
+
+    edge_values = [np.nan, np.inf, -np.inf, 0.0, -0.0, -5e-5, 0.125, 0.135, 2.675, -1.005, 1e17, 1e300]
+    series = pd.Series(edge_values + list(rng.uniform(-1000, 1000, 1_000)) + list(rng.uniform(0, 100, 1_000).round(2)))
+
+    expected = series.apply(agf.add_perc_symbol)
+
+    pd.testing.assert_series_equal(agf.make_perc_col(series), expected)
+    pd.testing.assert_series_equal(agf.make_perc_col(series, categorical = True).astype(object), expected)
+
+def test_college_index_skips_missing_names():
+    sheets = make_sheets(num_colleges = 30, num_options = 10, num_rows = 600)
+    db = ad.build_db(sheets, compact = False)
+
+    # A few applications without a college name
+    db.main.loc[[0, 5, 17], "name"] = None
+    db["college_index"] = CollegeIndex(db.main, db.college_stats, db.colleges)
+
+    for name in db.colleges["name"]:
+        expected = college_lookup_pandas(db, name)
+        result = college_lookup_index(db, name)
+
+        assert result[:2] == expected[:2]
+        pd.testing.assert_frame_equal(result[2], expected[2])
+
+def test_overview_store_skips_missing_respondents():
+    sheets = make_sheets(num_colleges = 50, num_options = 20, num_rows = 2_000)
+
+    # Keep missing respondent codes as missing values instead of the string "None".
+    sheets["ddict"].loc[sheets["ddict"]["var_name"] == "respondent_code", "primitive_type"] = "object"
+    sheets["main"].loc[[0, 5, 17, 1_500], "respondent_code"] = None
+
+    db = ad.build_db(sheets)
+    original_db = ad.build_db(sheets, compact = False)
+
+    # The rows are added in two batches, so that respondents are added to a store that already has some.
+    indicators = ad.load_indicators(db)
+    store = OverviewStore(db.ddict)
+    for rows in [slice(0, 1_000), slice(1_000, 2_000)]:
+        store.update(db.main.iloc[rows], IndicatorStore.from_frame(original_db.main.iloc[rows], indicators.var_names))
+
+    for college_types in COLLEGE_TYPE_SETS:
+        for info_type in ["location", "interests", "characteristics"]:
+            expected = checkbox_chart_pandas(original_db, info_type, set(college_types))
+            result = store.checkbox_chart(info_type, set(college_types))
+
+            pd.testing.assert_frame_equal(result[expected.columns], expected)
+
+        expected_median, expected_df = num_colleges_chart_pandas(original_db, set(college_types))
+        result_median, result_df = store.num_colleges_chart(set(college_types))
+
+        assert result_median == expected_median
+        assert np.array_equal(result_df[["num_apps", "num_students"]].to_numpy(), expected_df[["num_apps", "num_students"]].to_numpy())
+
+def test_refresher_reloads_when_loaded_rows_change(tmp_path):
+    sheets = make_sheets(num_colleges = 20, num_options = 10, num_rows = 300)
+    main = sheets["main"]
+    path = str(tmp_path / "snapshot.sqlite")
+
+    def save_main(main_df):
+        ad.save_snapshot({**sheets, "main": main_df.reset_index(drop = True)}, path)
+        return main_df
+
+    def assert_same_as_full_build(db, main_df):
+        full = ad.build_db({**sheets, "main": main_df.reset_index(drop = True)})
+        for table_name in ["apps", "college_stats", "college_summary", "option_summary"]:
+            pd.testing.assert_frame_equal(db[table_name], full[table_name])
+
+    current = save_main(main.iloc[:200])
+    refresher = DataRefresher({"data_source": {"backend": "local", "path": path, "refresh_seconds": 0}})
+
+    assert refresher.refresh() == "unchanged"
+
+    # New rows at the end are appended.
+    current = save_main(main.iloc[:250])
+    assert refresher.refresh() == "appended"
+    assert_same_as_full_build(refresher.db, current)
+
+    # The last loaded row is deleted and new rows are added, so the new rows do not start where the loaded ones end.
+    current = save_main(pd.concat([main.iloc[:249], main.iloc[250:260]]))
+    assert refresher.refresh() == "reloaded"
+    assert_same_as_full_build(refresher.db, current)
+
+    # The last row is edited, and the number of rows stays the same.
+    edited = current.copy()
+    other_name = next(name for name in sheets["colleges"]["name"] if name != edited["name"].iloc[-1])
+    edited.iloc[-1, edited.columns.get_loc("name")] = other_name
+    current = save_main(edited)
+    assert refresher.refresh() == "reloaded"
+    assert_same_as_full_build(refresher.db, current)
+
+    # Rows are deleted from the end.
+    current = save_main(current.iloc[:240])
+    assert refresher.refresh() == "reloaded"
+    assert_same_as_full_build(refresher.db, current)